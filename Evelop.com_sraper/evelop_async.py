@@ -0,0 +1,220 @@
+"""Python 3.7. Asyncio client of the web site https://www.evelop.com/."""
+
+import argparse
+import asyncio
+import json
+
+import aiohttp
+from lxml import html
+
+import evelop_fake_server
+import evelop_routes
+import evelop_scraper
+
+LIMIT = 100
+LIMIT_PER_HOST = 10
+
+
+def stringify(params):
+    """Convert values of params to strings for query and form data."""
+
+    return {key: str(value) for key, value in params.items()}
+
+
+def get_session_id(session):
+    """Get IDSESION cookie of the session."""
+
+    for cookie in session.cookie_jar:
+        if cookie.key == 'IDSESION':
+            return cookie.value.strip('"')
+
+    raise aiohttp.ClientError(
+        'The site has not set IDSESION cookie of the session.')
+
+
+class EvelopClient:
+    """Run searches concurrently on one shared connection pool.
+
+    Every search gets a session with a cookie jar of its own, because
+    the site keeps selected flights in the session.
+    """
+
+    def __init__(self, limit=LIMIT, limit_per_host=LIMIT_PER_HOST,
+                 evelop_url=None, secure_url=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.evelop_url = evelop_url or evelop_scraper.EVELOP_URL
+        self.secure_url = secure_url or evelop_scraper.SECURE_URL
+        self.connector = None
+
+    async def __aenter__(self):
+        self.connector = aiohttp.TCPConnector(
+            limit=self.limit, limit_per_host=self.limit_per_host, ssl=False)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.connector.close()
+
+    def create_session(self):
+        """Create session with cookies of its own on the shared pool."""
+
+        return aiohttp.ClientSession(
+            connector=self.connector,
+            connector_owner=False,
+            cookie_jar=aiohttp.CookieJar(unsafe=True)
+        )
+
+    async def get_available_routes(self):
+        """Generate list of available routes."""
+
+        async with self.create_session() as session:
+            async with session.get(self.evelop_url + '/') as response:
+                return evelop_routes.build_index(
+                    evelop_routes.parse_routes(await response.read()))
+
+    async def get_data_page(self, search_params, session):
+        """Get html page from web-site."""
+
+        params = stringify(
+            evelop_scraper.generate_request_params(search_params))
+        async with session.post(
+                self.evelop_url + evelop_scraper.SEARCH_PATH,
+                data=params) as response:
+            return html.fromstring(await response.read())
+
+    async def get_price(self, session, search_params, *params_for_requests):
+        """Get price of quote."""
+
+        param_for_get_price = stringify(
+            evelop_scraper.generate_price_params(search_params))
+        param_for_price = {'sesion': get_session_id(session)}
+        valoracion_url = self.evelop_url + evelop_scraper.VALORACION_PATH
+        price_url = self.secure_url + evelop_scraper.PRICE_PATH
+
+        if search_params['flight_type'] == 'ONE_WAY':
+            param_for_get_price['idSeleccionado'] = params_for_requests[0]
+            async with session.get(
+                    valoracion_url, params=param_for_get_price) as response:
+                await response.read()
+            async with session.get(
+                    price_url, params=param_for_price) as response:
+                return evelop_scraper.parse_price_page(
+                    await response.read(), 'ONE_WAY')
+
+        async with session.get(
+                valoracion_url, params=param_for_get_price) as response:
+            await response.read()
+        for param in params_for_requests:
+            async with session.get(
+                    self.evelop_url + evelop_scraper.SELECT_FLIGHT_PATH,
+                    params=stringify(param)) as response:
+                await response.read()
+        async with session.get(
+                valoracion_url, params=param_for_get_price) as response:
+            await response.read()
+        async with session.get(price_url, params=param_for_price) as response:
+            return evelop_scraper.parse_price_page(
+                await response.text(), 'ROUND_TRIP')
+
+    async def price_quotes(self, unpriced, search_params, session,
+                           workers=1):
+        """Get prices for quotes using up to "workers" sessions at once."""
+
+        workers = max(1, min(workers, len(unpriced)))
+        extra_sessions = [self.create_session() for _ in range(workers - 1)]
+        try:
+            await asyncio.gather(*(
+                self.get_data_page(search_params, extra_session)
+                for extra_session in extra_sessions
+            ))
+            sessions = asyncio.Queue()
+            for worker_session in [session] + extra_sessions:
+                sessions.put_nowait(worker_session)
+
+            async def price(quote, params_for_requests):
+                worker_session = await sessions.get()
+                try:
+                    return quote.with_price(await self.get_price(
+                        worker_session, search_params, *params_for_requests))
+                finally:
+                    sessions.put_nowait(worker_session)
+
+            return list(await asyncio.gather(*(
+                price(quote, params_for_requests)
+                for quote, params_for_requests in unpriced
+            )))
+        finally:
+            for extra_session in extra_sessions:
+                await extra_session.close()
+
+    async def scrape(self, search_params, workers=1):
+        """Return quotes of one search."""
+
+        async with self.create_session() as session:
+            data_page = await self.get_data_page(search_params, session)
+            unpriced = evelop_scraper.extract_quotes(data_page, search_params)
+            if unpriced is None:
+                return None
+            return await self.price_quotes(
+                unpriced, search_params, session, workers)
+
+    async def scrape_many(self, searches, concurrency=LIMIT, workers=1):
+        """Return quotes of many searches, keeping order of searches."""
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def scrape_one(search_params):
+            async with semaphore:
+                return await self.scrape(search_params, workers)
+
+        return await asyncio.gather(*(
+            scrape_one(search_params) for search_params in searches))
+
+
+async def run(searches, args):
+    """Run searches and print results."""
+
+    async with EvelopClient(
+            limit_per_host=args.limit_per_host,
+            evelop_url=args.url, secure_url=args.url) as client:
+        results = await client.scrape_many(
+            searches, args.concurrency, args.workers)
+    for search_params, quotes in zip(searches, results):
+        print('{dep_city} - {arr_city} {dep_date}'.format(**search_params))
+        evelop_scraper.print_results(quotes)
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument(
+        'searches',
+        help='input JSON file with search params or list of them'
+    )
+    PARSER.add_argument(
+        '-c', '--concurrency', type=int, default=LIMIT,
+        help='input number of searches run at once'
+    )
+    PARSER.add_argument(
+        '-l', '--limit_per_host', type=int, default=LIMIT_PER_HOST,
+        help='input number of connections to one host'
+    )
+    PARSER.add_argument(
+        '-w', '--workers', type=int, default=1,
+        help='input number of sessions used for pricing quotes of a search'
+    )
+    PARSER.add_argument(
+        '--fixture_dir', help='input directory with recorded pages '
+                              'to search on a local fake server'
+    )
+    ARGS = PARSER.parse_args()
+    ARGS.url = None
+    with open(ARGS.searches) as SEARCHES_FILE:
+        SEARCHES = json.load(SEARCHES_FILE)
+    if isinstance(SEARCHES, dict):
+        SEARCHES = [SEARCHES]
+    if ARGS.fixture_dir:
+        with evelop_fake_server.FakeEvelopServer(ARGS.fixture_dir) as SERVER:
+            ARGS.url = SERVER.url
+            asyncio.run(run(SEARCHES, ARGS))
+    else:
+        asyncio.run(run(SEARCHES, ARGS))
@@ -0,0 +1,249 @@
+"""Python 3.7. Batch searches on the web site https://www.evelop.com/.
+
+Search specs are read from a CSV or JSONL file with the columns of
+search params (flight_type, dep_city, arr_city, dep_date, ret_date,
+adults, children, infants). Duplicates are searched once. Results are
+appended to a JSONL file as soon as a search is finished and the key of
+the search is written to a checkpoint file, so an interrupted run can
+be started again and goes on with searches that were not finished.
+"""
+
+import argparse
+import csv
+import json
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import evelop_cache
+import evelop_history
+import evelop_metrics
+import evelop_models
+import evelop_scraper
+import evelop_transport
+
+REQUESTS_PER_SECOND = 5
+
+
+class RateLimiter:
+    """Token bucket shared by all threads."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a request may be sent."""
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst,
+                    self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedAdapter(evelop_transport.EvelopAdapter):
+    """Transport adapter sending requests under the rate limit."""
+
+    def __init__(self, rate_limiter, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(**kwargs)
+
+    def send_once(self, request, **kwargs):
+        # Retries are limited too.
+        self.rate_limiter.acquire()
+        return super().send_once(request, **kwargs)
+
+
+def read_specs(path):
+    """Read search specs from CSV or JSONL file."""
+
+    with open(path, newline='') as specs_file:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(specs_file)
+        else:
+            for line in specs_file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def check_spec(spec):
+    """Check search spec and convert it to search params."""
+
+    flight_type = spec.get('flight_type')
+    if not evelop_scraper.check_flight_type(flight_type):
+        return None
+    flight_type = flight_type.upper()
+    if not evelop_scraper.check_cities(spec.get('dep_city'),
+                                       spec.get('arr_city')):
+        return None
+    ret_date = spec.get('ret_date') or spec.get('dep_date')
+    if flight_type == 'ONE_WAY':
+        dates = spec.get('dep_date'),
+    else:
+        dates = spec.get('dep_date'), ret_date
+    if not evelop_scraper.check_dates(*dates):
+        return None
+    adults = spec.get('adults')
+    children = spec.get('children') or 0
+    infants = spec.get('infants') or 0
+    if not evelop_scraper.check_passengers(adults, children, infants):
+        return None
+
+    return {
+        'flight_type': flight_type,
+        'dep_city': spec['dep_city'].upper(),
+        'arr_city': spec['arr_city'].upper(),
+        'dep_date': spec['dep_date'],
+        'ret_date': ret_date,
+        'adults': str(adults),
+        'children': str(children),
+        'infants': str(infants)
+    }
+
+
+def load_checkpoint(path):
+    """Get keys of finished searches."""
+
+    try:
+        with open(path) as checkpoint_file:
+            return {line.rstrip('\n') for line in checkpoint_file}
+    except FileNotFoundError:
+        return set()
+
+
+def plan_searches(specs, done):
+    """Check and deduplicate specs, skip finished searches."""
+
+    searches = {}
+    for number, spec in enumerate(specs, 1):
+        search_params = check_spec(spec)
+        if search_params is None:
+            print('Spec', number, 'is skipped.')
+            continue
+        key = evelop_cache.search_key(search_params)
+        if key not in done:
+            searches.setdefault(key, search_params)
+
+    return searches
+
+
+def run_batch(searches, output, checkpoint, workers=1, pricing_workers=1,
+              history=None):
+    """Run searches and write results as soon as they are finished."""
+
+    finished = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            open(output, 'a') as output_file, \
+            open(checkpoint, 'a') as checkpoint_file:
+        futures = {
+            executor.submit(
+                evelop_scraper.scrape, search_params, pricing_workers): key
+            for key, search_params in searches.items()
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                quotes = future.result()
+            except Exception as error:
+                failed += 1
+                print('Search', key, 'failed:', repr(error))
+                continue
+            scraped_at = time.time()
+            output_file.write(json.dumps({
+                'search': searches[key],
+                'scraped_at': scraped_at,
+                'quotes': [
+                    evelop_models.quote_to_dict(quote)
+                    for quote in quotes or []
+                ]
+            }) + '\n')
+            output_file.flush()
+            if history is not None:
+                history.add(searches[key], quotes or [], scraped_at)
+            # Search is finished only when its results are written.
+            checkpoint_file.write(key + '\n')
+            checkpoint_file.flush()
+            finished += 1
+    if history is not None:
+        history.flush()
+
+    return finished, failed
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('specs', help='input CSV or JSONL file with searches')
+    PARSER.add_argument(
+        '-o', '--output', default='results.jsonl',
+        help='input JSONL file for results'
+    )
+    PARSER.add_argument(
+        '-c', '--checkpoint', default='results.checkpoint',
+        help='input file with keys of finished searches'
+    )
+    PARSER.add_argument(
+        '-w', '--workers', type=int, default=4,
+        help='input number of searches run at once'
+    )
+    PARSER.add_argument(
+        '-p', '--pricing_workers', type=int, default=1,
+        help='input number of sessions used for pricing quotes of a search'
+    )
+    PARSER.add_argument(
+        '-r', '--rate', type=float, default=REQUESTS_PER_SECOND,
+        help='input maximal number of requests per second'
+    )
+    PARSER.add_argument(
+        '--price_ttl', type=int, default=evelop_cache.PRICE_TTL,
+        help='input number of seconds prices are reused for (0 to disable)'
+    )
+    PARSER.add_argument(
+        '--history_db', help='input SQLite file for history of quotes')
+    PARSER.add_argument(
+        '--metrics', choices=('json', 'prometheus'),
+        help='input format of report of stage timings written at the end'
+    )
+    PARSER.add_argument(
+        '--metrics_file', help='input file for report of stage timings')
+    ARGS = PARSER.parse_args()
+
+    if ARGS.metrics:
+        evelop_metrics.enable()
+    if ARGS.price_ttl > 0:
+        evelop_scraper.PRICE_MEMO = evelop_cache.MemoryCache(
+            evelop_cache.PRICE_MEMO_SIZE, ARGS.price_ttl)
+    evelop_scraper.AVAILABLE_ROUTES = evelop_scraper.get_available_routes()
+    POOL_SIZE = ARGS.workers * ARGS.pricing_workers
+    evelop_scraper.HTTP_ADAPTER = RateLimitedAdapter(
+        RateLimiter(ARGS.rate), pool_connections=2, pool_maxsize=POOL_SIZE)
+    evelop_scraper.SESSION_POOL = evelop_scraper.create_session_pool(
+        POOL_SIZE)
+    SEARCHES = plan_searches(
+        read_specs(ARGS.specs), load_checkpoint(ARGS.checkpoint))
+    print('Searches to run:', len(SEARCHES))
+    HISTORY = None
+    if ARGS.history_db:
+        HISTORY = evelop_history.QuoteHistory(ARGS.history_db)
+    FINISHED, FAILED = run_batch(
+        SEARCHES, ARGS.output, ARGS.checkpoint,
+        ARGS.workers, ARGS.pricing_workers, HISTORY
+    )
+    evelop_scraper.SESSION_POOL.close()
+    if HISTORY is not None:
+        HISTORY.close()
+    print('Finished:', FINISHED, 'Failed:', FAILED)
+    if ARGS.metrics:
+        evelop_metrics.write_report(ARGS.metrics, ARGS.metrics_file)
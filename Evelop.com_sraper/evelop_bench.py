@@ -0,0 +1,196 @@
+"""Python 3.7. Benchmarks of the scraper of https://www.evelop.com/.
+
+Times parsing and pricing functions on searches recorded with
+evelop_replay (e.g. fixtures/small), without network. Results are appended to a JSON file together with
+the current git commit, so they can be compared between commits:
+
+    python evelop_bench.py fixtures/small
+    python evelop_bench.py fixtures/small --compare 5e63441
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import time
+
+from lxml import html
+
+import evelop_fake_server
+import evelop_replay
+import evelop_scraper
+
+RESULTS_FILE = 'bench_results.json'
+REPEAT = 5
+
+
+def best_time(function, repeat=REPEAT):
+    """Get the lowest time of function call in seconds."""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def load_search_page(records):
+    """Get tree of recorded page with search results."""
+
+    for (method, _), path_records in records.items():
+        if method == 'POST':
+            return html.fromstring(path_records[0]['content'])
+
+    raise ValueError('Fixture has no search results page.')
+
+
+def get_data_divs(data_page, search_params):
+    """Get div elements with data of flights of search results page."""
+
+    data = evelop_scraper.RESULTS_XPATH(data_page)[0]
+    if search_params['flight_type'] == 'ONE_WAY':
+        return [
+            evelop_scraper.ONE_WAY_DATA_XPATH(result)[0]
+            for result in evelop_scraper.ONE_WAY_RESULTS_XPATH(data)
+        ]
+
+    return [
+        flight
+        for results in evelop_scraper.ROUND_TRIP_RESULTS_XPATH(data)
+        for flight in evelop_scraper.ROUND_TRIP_DATA_XPATH(results)
+    ]
+
+
+def bench_fixture(fixture_dir, repeat=REPEAT):
+    """Time functions of scraper on recorded search."""
+
+    search_params = evelop_replay.load_search_params(fixture_dir)
+    records = evelop_fake_server.load_fixture(fixture_dir)
+    data_page = load_search_page(records)
+    data_divs = get_data_divs(data_page, search_params)
+    flight_type = search_params['flight_type']
+    flights = [
+        evelop_scraper.parse_data_div(data_div, flight_type)
+        for data_div in data_divs
+    ]
+    unpriced = evelop_scraper.extract_quotes(data_page, search_params)
+
+    def extract_quotes():
+        evelop_scraper.extract_quotes(data_page, search_params)
+
+    def price_quotes():
+        session = evelop_replay.replay_session(
+            evelop_fake_server.Fixture(fixture_dir, records))
+        #  The session is got by the search, which is not timed here.
+        session.cookies.set('IDSESION', '"BENCH"')
+        evelop_scraper.price_quotes(unpriced, search_params, session)
+
+    def parse_data_divs():
+        for data_div in data_divs:
+            evelop_scraper.parse_data_div(data_div, flight_type)
+
+    def get_price():
+        session = evelop_replay.replay_session(
+            evelop_fake_server.Fixture(fixture_dir, records))
+        evelop_scraper.get_data_page(search_params, session)
+        evelop_scraper.get_price(session, search_params, *unpriced[0][1])
+
+    def generate_flight_times():
+        for flight in flights:
+            evelop_scraper.generate_flight_time(
+                flight['dep_time'], flight['arr_time'])
+
+    results = {
+        'flights': len(flights),
+        'quotes': len(unpriced),
+        'extract_quotes': best_time(extract_quotes, repeat),
+        'parse_data_div': best_time(parse_data_divs, repeat),
+        'generate_flight_time': best_time(generate_flight_times, repeat)
+    }
+    if unpriced:
+        # Pricing replays a request per quote, so it is timed apart
+        # from parsing, which it would hide.
+        results['price_quotes'] = best_time(price_quotes, repeat)
+        results['get_price'] = best_time(get_price, repeat)
+
+    return results
+
+
+def get_commit():
+    """Get hash of current git commit."""
+
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+            # The commit of the benchmarked code, wherever it is run from.
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def load_results(path):
+    """Load stored runs of benchmarks."""
+
+    if not os.path.isfile(path):
+        return []
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def save_results(path, runs):
+    """Store runs of benchmarks."""
+
+    with open(path, 'w') as results_file:
+        json.dump(runs, results_file, indent=1)
+
+
+def print_run(run, previous=None):
+    """Print results of run, compared with previous one if given."""
+
+    print('Commit:', run['commit'])
+    for fixture, results in sorted(run['fixtures'].items()):
+        print('{0} ({1} flights, {2} quotes)'.format(
+            fixture, results['flights'], results['quotes']))
+        old_results = (previous or {}).get('fixtures', {}).get(fixture, {})
+        for name, seconds in sorted(results.items()):
+            if name in ('flights', 'quotes'):
+                continue
+            line = '    {0:<22}{1:>10.3f} ms'.format(name, seconds * 1000)
+            if old_results.get(name):
+                line += '  x{:.2f} vs {}'.format(
+                    old_results[name] / seconds, previous['commit'])
+            print(line)
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument(
+        'fixtures', nargs='+', help='input directories of recorded searches')
+    PARSER.add_argument('-r', '--repeat', type=int, default=REPEAT)
+    PARSER.add_argument('-o', '--output', default=RESULTS_FILE)
+    PARSER.add_argument(
+        '-c', '--compare',
+        help='input commit to compare with (previous run by default)'
+    )
+    ARGS = PARSER.parse_args()
+
+    RUNS = load_results(ARGS.output)
+    RUN = {
+        'commit': get_commit(),
+        'time': time.time(),
+        'fixtures': {
+            os.path.basename(os.path.normpath(fixture)):
+                bench_fixture(fixture, ARGS.repeat)
+            for fixture in ARGS.fixtures
+        }
+    }
+    PREVIOUS = [
+        run for run in RUNS
+        if not ARGS.compare or run['commit'].startswith(ARGS.compare)
+    ]
+    print_run(RUN, PREVIOUS[-1] if PREVIOUS else None)
+    save_results(ARGS.output, RUNS + [RUN])
@@ -0,0 +1,216 @@
+"""Python 3.7. Caches of search results of the web site https://www.evelop.com/.
+
+Results are kept by a key made of normalized search params for "ttl"
+seconds. When a cache is full, the least recently used result is evicted.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+
+CACHE_TTL = 5 * 60
+CACHE_SIZE = 1000
+#  Prices of selected flights change more often than lists of flights.
+PRICE_TTL = 60
+PRICE_MEMO_SIZE = 10000
+
+
+def search_key(search_params, **extra):
+    """Generate cache key from normalized search params."""
+
+    flight_type = search_params['flight_type'].upper()
+    dep_date = normalize_date(search_params['dep_date'])
+    if flight_type == 'ONE_WAY':
+        ret_date = dep_date
+    else:
+        ret_date = normalize_date(search_params['ret_date'])
+    key = {
+        'flight_type': flight_type,
+        'dep_city': search_params['dep_city'].upper(),
+        'arr_city': search_params['arr_city'].upper(),
+        'dep_date': dep_date,
+        'ret_date': ret_date,
+        'adults': int(search_params['adults']),
+        'children': int(search_params['children']),
+        'infants': int(search_params['infants'])
+    }
+    key.update(extra)
+
+    return json.dumps(key, sort_keys=True)
+
+
+def flight_selection(params_for_requests):
+    """Get ids of flights selected for pricing."""
+
+    return [
+        param['flightId'] if isinstance(param, dict) else param
+        for param in params_for_requests
+    ]
+
+
+def price_key(search_params, params_for_requests, legs):
+    """Generate key of price of flights selected in search.
+
+    Ids of flights are only valid within one list of results, so
+    departure and arrival times and cabin classes of legs (Flight
+    objects) are a part of the key too.
+    """
+
+    return search_key(
+        search_params,
+        selection=flight_selection(params_for_requests),
+        legs=[[leg.dep_time, leg.arr_time, leg.cabin_class] for leg in legs]
+    )
+
+
+def normalize_date(date):
+    """Convert date like "1.2.2030" or "01-02-2030" to "01/02/2030"."""
+
+    day, month, year = re.split(r'[.\-/]', date.strip())
+
+    return '{0:02d}/{1:02d}/{2}'.format(int(day), int(month), year)
+
+
+class MemoryCache:
+    """In-memory LRU cache with expiration of items."""
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        """Get value by key, return None if it is missing or expired."""
+
+        with self.lock:
+            item = self.items.get(key)
+            if item is None or time.time() - item[0] >= self.ttl:
+                if item is not None:
+                    del self.items[key]
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        """Store value, evicting least recently used ones if full."""
+
+        with self.lock:
+            self.items[key] = (time.time(), value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Get statistics of cache usage."""
+
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.items)
+            }
+
+
+class SQLiteCache:
+    """LRU cache with expiration of items stored in SQLite database."""
+
+    def __init__(self, path, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS Search_cache(Key TEXT PRIMARY KEY, '
+            'Value TEXT, Created_at REAL, Used_at REAL)'
+        )
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS Search_cache_used_at '
+            'ON Search_cache(Used_at)'
+        )
+        self.conn.commit()
+
+    def get(self, key):
+        """Get value by key, return None if it is missing or expired."""
+
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                'SELECT Value, Created_at FROM Search_cache WHERE Key=?',
+                [key]
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                if row is not None:
+                    self.conn.execute(
+                        'DELETE FROM Search_cache WHERE Key=?', [key])
+                self.misses += 1
+                return None
+            self.conn.execute(
+                'UPDATE Search_cache SET Used_at=? WHERE Key=?', [now, key])
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store value, evicting least recently used ones if full."""
+
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO Search_cache(Key, Value, Created_at, '
+                'Used_at) VALUES (?, ?, ?, ?)',
+                [key, json.dumps(value), now, now]
+            )
+            evicted = self.conn.execute(
+                'DELETE FROM Search_cache WHERE Key IN (SELECT Key FROM '
+                'Search_cache ORDER BY Used_at DESC LIMIT -1 OFFSET ?)',
+                [self.max_size]
+            ).rowcount
+            self.evictions += evicted
+
+    def stats(self):
+        """Get statistics of cache usage."""
+
+        with self.lock:
+            size = self.conn.execute(
+                'SELECT COUNT(*) FROM Search_cache').fetchone()[0]
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': size
+            }
+
+    def close(self):
+        self.conn.close()
+
+
+def create_cache(path=None, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+    """Create SQLite cache if path is given, in-memory cache otherwise."""
+
+    if path:
+        return SQLiteCache(path, max_size, ttl)
+
+    return MemoryCache(max_size, ttl)
+
+
+def print_stats(cache, name='Cache'):
+    """Print statistics of cache usage."""
+
+    stats = cache.stats()
+    requests = stats['hits'] + stats['misses']
+    print(
+        name + ': {hits} hits, {misses} misses, {evictions} evictions, '
+        '{size} items.'.format(**stats),
+        'Hit ratio: {:.0%}.'.format(stats['hits'] / requests)
+        if requests else ''
+    )
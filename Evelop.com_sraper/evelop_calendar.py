@@ -0,0 +1,269 @@
+"""Python 3.7. Fare calendar of the web site https://www.evelop.com/.
+
+Finds minimal price for every day of a date window. Days without
+flights in the schedule of the route are not searched. Every pair of
+dates of a round trip is searched as a round trip; with --estimate a
+round trip price is estimated as the sum of minimal one-way prices of
+its days instead (evelop_scraper.get_leg_bounds uses the same sum only
+as a bound), so a window of N days needs about 2 * N searches instead
+of N * N. Estimates are printed marked as such.
+"""
+
+import argparse
+import datetime
+import queue
+
+from concurrent.futures import ThreadPoolExecutor
+
+import evelop_prices
+import evelop_routes
+import evelop_scraper
+import evelop_sql
+
+
+def parse_date(date):
+    """Convert date like "01/02/2030" to datetime.date."""
+
+    return datetime.datetime.strptime(
+        date.replace('.', '/').replace('-', '/'), '%d/%m/%Y').date()
+
+
+def min_price(quotes):
+    """Get the lowest price of quotes as (cents, currency) or None."""
+
+    prices = [
+        (quote.price_cents, quote.currency)
+        for quote in quotes if quote.price_cents is not None
+    ]
+
+    return min(prices) if prices else None
+
+
+def search_min_price(search_params, session, bounds=None):
+    """Get the lowest price of search, pricing as few quotes as possible.
+
+    "bounds" are one-way bounds of legs of a round trip, see
+    evelop_scraper.cheapest_quotes().
+    """
+
+    data_page = evelop_scraper.get_data_page(search_params, session)
+    unpriced = evelop_scraper.extract_quotes(data_page, search_params)
+
+    return min_price(evelop_scraper.cheapest_quotes(
+        unpriced or [], search_params, session, 1, bounds=bounds))
+
+
+def search_bounds(search_params, session):
+    """Get one-way prices of flights of search by (dep_time, arr_time)."""
+
+    return evelop_scraper.get_one_way_bounds(search_params, session=session)
+
+
+def sweep(search, searches, workers):
+    """Run search(search_params, session, ...) reusing sessions."""
+
+    # A session used for one date keeps its cookies and connections
+    # for the next one, so only the first search of a session warms it.
+    sessions = queue.Queue()
+    for _ in range(workers):
+        sessions.put(evelop_scraper.create_session())
+
+    def run(search_args):
+        search_params, *extra_args = search_args
+        session = sessions.get()
+        try:
+            return search(search_params, session, *extra_args)
+        finally:
+            sessions.put(session)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, searches))
+
+
+def generate_search_params(dep_city, arr_city, dep_date, ret_date,
+                           passengers, flight_type='ONE_WAY'):
+    """Generate search params for dates."""
+
+    return dict(
+        passengers,
+        flight_type=flight_type,
+        dep_city=dep_city,
+        arr_city=arr_city,
+        dep_date=dep_date.strftime('%d/%m/%Y'),
+        ret_date=ret_date.strftime('%d/%m/%Y')
+    )
+
+
+def one_way_calendar(dep_city, arr_city, dates, passengers, workers):
+    """Map dates to the lowest one-way prices."""
+
+    dates = sorted(dates)
+    prices = sweep(
+        search_min_price,
+        [
+            [generate_search_params(
+                dep_city, arr_city, date, date, passengers)]
+            for date in dates
+        ],
+        workers
+    )
+
+    return {date: price for date, price in zip(dates, prices) if price}
+
+
+def bounds_calendar(dep_city, arr_city, dates, passengers, workers):
+    """Map dates to one-way prices of flights by (dep_time, arr_time)."""
+
+    dates = sorted(dates)
+    bounds = sweep(
+        search_bounds,
+        [
+            [generate_search_params(
+                dep_city, arr_city, date, date, passengers)]
+            for date in dates
+        ],
+        workers
+    )
+
+    return dict(zip(dates, bounds))
+
+
+def fare_calendar(dep_city, arr_city, start, end, passengers,
+                  schedule_index, flight_type='ONE_WAY', max_stay=None,
+                  estimate=False, workers=4):
+    """Map dates (pairs of dates for round trip) to the lowest prices.
+
+    Dates of flights are taken from schedule_index of
+    evelop_sql.index_schedules().
+    """
+
+    def in_window(route):
+        route_dates = schedule_index.get(route)
+        if route_dates is None:
+            return set()
+        return {
+            date
+            for year, bitmap in route_dates.days.items()
+            for date in evelop_sql.iter_days(
+                year, bitmap & evelop_sql.day_range_mask(year, start, end))
+        }
+
+    dep_dates = in_window((dep_city, arr_city))
+    if flight_type not in ('ONE_WAY', 'ROUND_TRIP'):
+        raise ValueError('Unknown flight type {}.'.format(flight_type))
+    if flight_type == 'ONE_WAY':
+        return one_way_calendar(
+            dep_city, arr_city, dep_dates, passengers, workers)
+
+    ret_dates = in_window((arr_city, dep_city))
+    pairs = [
+        (dep_date, ret_date)
+        for dep_date in sorted(dep_dates) for ret_date in sorted(ret_dates)
+        if dep_date < ret_date and (
+            max_stay is None or (ret_date - dep_date).days <= max_stay)
+    ]
+    if not estimate:
+        # One-way searches of every date bound prices of all pairs
+        # of dates, so each round trip search prices few quotes.
+        outbound = bounds_calendar(
+            dep_city, arr_city, {pair[0] for pair in pairs}, passengers,
+            workers
+        )
+        inbound = bounds_calendar(
+            arr_city, dep_city, {pair[1] for pair in pairs}, passengers,
+            workers
+        )
+        prices = sweep(
+            search_min_price,
+            [
+                [
+                    generate_search_params(
+                        dep_city, arr_city, dep_date, ret_date, passengers,
+                        'ROUND_TRIP'
+                    ),
+                    (outbound[dep_date], inbound[ret_date])
+                ]
+                for dep_date, ret_date in pairs
+            ],
+            workers
+        )
+        return {pair: price for pair, price in zip(pairs, prices) if price}
+
+    outbound = one_way_calendar(
+        dep_city, arr_city, {pair[0] for pair in pairs}, passengers, workers)
+    inbound = one_way_calendar(
+        arr_city, dep_city, {pair[1] for pair in pairs}, passengers, workers)
+    calendar = {}
+    for dep_date, ret_date in pairs:
+        if dep_date not in outbound or ret_date not in inbound:
+            continue
+        (ob_cents, ob_currency), (ib_cents, ib_currency) = (
+            outbound[dep_date], inbound[ret_date])
+        # Prices in different currencies can't be added up.
+        if ob_currency == ib_currency:
+            calendar[dep_date, ret_date] = (
+                ob_cents + ib_cents, ob_currency)
+
+    return calendar
+
+
+def print_calendar(calendar, estimate=False):
+    """Print calendar of prices, marking estimated ones."""
+
+    if not calendar:
+        print('There are no flights in these dates.')
+    elif estimate:
+        print('Estimates: sums of the lowest one-way prices of dates.')
+    for dates, (cents, currency) in sorted(calendar.items()):
+        if isinstance(dates, tuple):
+            dates = ' - '.join(date.strftime('%d/%m/%Y') for date in dates)
+        else:
+            dates = dates.strftime('%d/%m/%Y')
+        price = evelop_prices.format_price(cents, currency)
+        if estimate:
+            price += ' (estimate)'
+        print(dates, price)
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('dep_city', help='input departure city')
+    PARSER.add_argument('arr_city', help='input arrival city')
+    PARSER.add_argument('start', help='input first date of window')
+    PARSER.add_argument('end', help='input last date of window')
+    PARSER.add_argument(
+        '-f', '--flight_type', type=str.upper, default='ONE_WAY',
+        choices=('ONE_WAY', 'ROUND_TRIP'),
+        help='input flight type("ONE_WAY" or "ROUND_TRIP")'
+    )
+    PARSER.add_argument(
+        '-m', '--max_stay', type=int, help='input maximal days of stay')
+    PARSER.add_argument(
+        '-e', '--estimate', action='store_true',
+        help='estimate round trip prices by one-way searches of dates'
+    )
+    PARSER.add_argument('-n_a', '--num_adults', default='1')
+    PARSER.add_argument('-n_c', '--num_child', default='0')
+    PARSER.add_argument('-n_i', '--num_infants', default='0')
+    PARSER.add_argument('-w', '--workers', type=int, default=4)
+    ARGS = PARSER.parse_args()
+
+    CALENDAR = fare_calendar(
+        ARGS.dep_city.upper(),
+        ARGS.arr_city.upper(),
+        parse_date(ARGS.start),
+        parse_date(ARGS.end),
+        {
+            'adults': ARGS.num_adults,
+            'children': ARGS.num_child,
+            'infants': ARGS.num_infants
+        },
+        evelop_sql.index_schedules(evelop_routes.get_catalog(
+            evelop_scraper.EVELOP_URL + '/')['dates']),
+        ARGS.flight_type,
+        ARGS.max_stay,
+        ARGS.estimate,
+        ARGS.workers
+    )
+    print_calendar(
+        CALENDAR, ARGS.estimate and ARGS.flight_type == 'ROUND_TRIP')
@@ -0,0 +1,93 @@
+"""Python 3.7. Export of quotes of the web site https://www.evelop.com/.
+
+Quotes are written one by one as soon as they are priced, so any number
+of them can be exported without keeping them in memory. Output goes to
+stdout or to a file with a large write buffer; files ending with ".gz"
+are compressed with gzip.
+"""
+
+import csv
+import gzip
+import json
+import sys
+
+import evelop_models
+
+BUFFER_SIZE = 1024 * 1024
+CSV_FIELDS = (
+    ['ob_' + field for field in evelop_models.Flight._fields] +
+    ['ib_' + field for field in evelop_models.Flight._fields] +
+    ['price_cents', 'currency']
+)
+NO_FLIGHT = (None,) * len(evelop_models.Flight._fields)
+
+
+def open_output(path=None):
+    """Open file for writing text, stdout if path is None or "-"."""
+
+    if path is None or path == '-':
+        return sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', newline='')
+
+    return open(path, 'w', buffering=BUFFER_SIZE, newline='')
+
+
+class QuoteWriter:
+    """Writer of quotes to file or stdout."""
+
+    def __init__(self, path=None):
+        self.stream = open_output(path)
+
+    def write(self, quote):
+        raise NotImplementedError
+
+    def write_all(self, quotes):
+        for quote in quotes:
+            self.write(quote)
+
+    def close(self):
+        if self.stream is sys.stdout:
+            self.stream.flush()
+        else:
+            self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonlWriter(QuoteWriter):
+    """Write quotes as JSON objects, one per line."""
+
+    def write(self, quote):
+        self.stream.write(
+            json.dumps(evelop_models.quote_to_dict(quote)) + '\n')
+
+
+class CsvWriter(QuoteWriter):
+    """Write quotes as CSV rows with legs in columns "ob_*" and "ib_*"."""
+
+    def __init__(self, path=None):
+        super().__init__(path)
+        self.writer = csv.writer(self.stream)
+        self.writer.writerow(CSV_FIELDS)
+
+    def write(self, quote):
+        self.writer.writerow((
+            *quote.outbound,
+            *(quote.inbound or NO_FLIGHT),
+            quote.price_cents,
+            quote.currency
+        ))
+
+
+WRITERS = {'jsonl': JsonlWriter, 'csv': CsvWriter}
+
+
+def create_writer(output_format, path=None):
+    """Create writer of quotes in "jsonl" or "csv" format."""
+
+    return WRITERS[output_format](path)
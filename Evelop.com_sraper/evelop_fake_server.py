@@ -0,0 +1,153 @@
+"""Python 3.7. Local fake of the web site https://www.evelop.com/.
+
+Serves recorded pages from a fixture directory, so the scrapers can be
+run offline. The directory contains "index.json" with a list of records:
+
+    {"method": "GET", "path": "/b2c/pages/flight/valoracion_esb.html",
+     "query": {"routeType": "ONE_WAY"}, "status": 200, "body": "3.html"}
+
+"query" is optional and must be a subset of the request params,
+"content_type" (default "text/html") should name the charset of pages.
+Records with the same method and path are served in turn, one by one.
+fixtures/small is a small synthetic round trip search MAD - CUN of
+01/01/2030 - 10/01/2030 (its params are in "search.json"):
+
+    python evelop_async.py fixtures/small/search.json \\
+        --fixture_dir fixtures/small
+"""
+
+import argparse
+import itertools
+import json
+import os
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+def load_fixture(fixture_dir):
+    """Load records of fixture and group them by method and path."""
+
+    with open(os.path.join(fixture_dir, 'index.json')) as index_file:
+        records = json.load(index_file)
+    grouped = {}
+    for record in records:
+        with open(os.path.join(fixture_dir, record['body']), 'rb') as body:
+            record = dict(record, content=body.read())
+        grouped.setdefault(
+            (record['method'].upper(), record['path']), []).append(record)
+
+    return grouped
+
+
+class Fixture:
+    """Recorded pages, records with same method and path go in turn."""
+
+    def __init__(self, fixture_dir, records=None):
+        self.records = records or load_fixture(fixture_dir)
+        self.turns = {}
+        self.lock = threading.Lock()
+
+    def find_record(self, method, path, params):
+        """Find next record for request."""
+
+        records = [
+            record for record in self.records.get((method, path), [])
+            if all(
+                params.get(key) == str(value)
+                for key, value in record.get('query', {}).items()
+            )
+        ]
+        if not records:
+            return None
+        key = method, path, tuple(id(record) for record in records)
+        with self.lock:
+            turn = self.turns.get(key, 0)
+            self.turns[key] = turn + 1
+
+        return records[turn % len(records)]
+
+
+class FakeEvelopHandler(BaseHTTPRequestHandler):
+    """Answer requests with recorded pages."""
+
+    def do_GET(self):
+        self.answer('GET')
+
+    def do_POST(self):
+        self.answer('POST')
+
+    def answer(self, method):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode()))
+        record = self.server.fixture.find_record(
+            method, url.path, params)
+        if record is None:
+            self.send_error(404)
+            return
+
+        self.send_response(record.get('status', 200))
+        self.send_header(
+            'Content-Type', record.get('content_type', 'text/html'))
+        self.send_header('Content-Length', str(len(record['content'])))
+        if 'IDSESION' not in (self.headers.get('Cookie') or ''):
+            self.send_header(
+                'Set-Cookie',
+                'IDSESION="{}"; Path=/'.format(self.server.new_session_id())
+            )
+        self.end_headers()
+        self.wfile.write(record['content'])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeEvelopServer(ThreadingHTTPServer):
+    """Fake Evelop server running in a background thread.
+
+    Usage:
+        with FakeEvelopServer('fixtures/small') as server:
+            evelop_scraper.EVELOP_URL = server.url
+            evelop_scraper.SECURE_URL = server.url
+    """
+
+    daemon_threads = True
+
+    def __init__(self, fixture_dir, port=0):
+        super().__init__(('127.0.0.1', port), FakeEvelopHandler)
+        self.fixture = Fixture(fixture_dir)
+        self.session_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}'.format(*self.server_address)
+
+    def new_session_id(self):
+        with self.lock:
+            return 'FAKE{}'.format(next(self.session_ids))
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('fixture_dir', help='input directory with pages')
+    PARSER.add_argument('-p', '--port', type=int, default=8000)
+    ARGS = PARSER.parse_args()
+    SERVER = FakeEvelopServer(ARGS.fixture_dir, ARGS.port)
+    print('Serving', ARGS.fixture_dir, 'on', SERVER.url)
+    SERVER.serve_forever()
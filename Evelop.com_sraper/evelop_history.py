@@ -0,0 +1,135 @@
+"""Python 3.7. History of quotes of the web site https://www.evelop.com/.
+
+Every quote of a search is stored with its legs, parsed price and the
+time of the search. Rows are written in batches by executemany in one
+transaction, the database works in WAL mode, and price series of a
+route and date are read by the (Route, Dep_date, Scraped_at) index.
+"""
+
+import sqlite3
+import time
+
+import evelop_cache
+
+HISTORY_DB = 'quote_history.db'
+BATCH_SIZE = 1000
+
+CREATE_TABLE = (
+    'CREATE TABLE IF NOT EXISTS Quote_history('
+    'ID INTEGER PRIMARY KEY, '
+    'Route TEXT NOT NULL, '
+    'Flight_type TEXT NOT NULL, '
+    'Dep_date TEXT NOT NULL, '
+    'Ret_date TEXT, '
+    'Ob_dep_time TEXT, Ob_arr_time TEXT, Ob_cabin_class TEXT, '
+    'Ib_dep_time TEXT, Ib_arr_time TEXT, Ib_cabin_class TEXT, '
+    'Adults INTEGER, Children INTEGER, Infants INTEGER, '
+    'Price_cents INTEGER, '
+    'Currency TEXT, '
+    'Scraped_at REAL NOT NULL)'
+)
+CREATE_INDEX = (
+    'CREATE INDEX IF NOT EXISTS Quote_history_route_date '
+    'ON Quote_history(Route, Dep_date, Scraped_at)'
+)
+INSERT_QUOTE = (
+    'INSERT INTO Quote_history(Route, Flight_type, Dep_date, Ret_date, '
+    'Ob_dep_time, Ob_arr_time, Ob_cabin_class, '
+    'Ib_dep_time, Ib_arr_time, Ib_cabin_class, '
+    'Adults, Children, Infants, Price_cents, Currency, Scraped_at) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+)
+SELECT_SERIES = (
+    'SELECT Scraped_at, MIN(Price_cents), Currency FROM Quote_history '
+    'WHERE Route=? AND Dep_date=? AND Scraped_at>=? '
+    'GROUP BY Scraped_at ORDER BY Scraped_at'
+)
+
+
+def iso_date(date):
+    """Convert date like "01/02/2030" to "2030-02-01"."""
+
+    day, month, year = evelop_cache.normalize_date(date).split('/')
+
+    return '-'.join((year, month, day))
+
+
+def generate_rows(search_params, quotes, scraped_at):
+    """Convert quotes of search to rows of table."""
+
+    route = '{0}-{1}'.format(
+        search_params['dep_city'].upper(), search_params['arr_city'].upper())
+    flight_type = search_params['flight_type'].upper()
+    dep_date = iso_date(search_params['dep_date'])
+    ret_date = None
+    if flight_type == 'ROUND_TRIP':
+        ret_date = iso_date(search_params['ret_date'])
+    passengers = (
+        int(search_params['adults']),
+        int(search_params['children']),
+        int(search_params['infants'])
+    )
+    for quote in quotes:
+        outbound, inbound = quote.outbound, quote.inbound
+        ib_fields = None, None, None
+        if inbound is not None:
+            ib_fields = inbound.dep_time, inbound.arr_time, inbound.cabin_class
+        yield (
+            route, flight_type, dep_date, ret_date,
+            outbound.dep_time, outbound.arr_time, outbound.cabin_class,
+            *ib_fields,
+            *passengers,
+            quote.price_cents,
+            quote.currency,
+            scraped_at
+        )
+
+
+class QuoteHistory:
+    """Store of quotes writing them in batches."""
+
+    def __init__(self, path=HISTORY_DB, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.rows = []
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute(CREATE_TABLE)
+            self.conn.execute(CREATE_INDEX)
+
+    def add(self, search_params, quotes, scraped_at=None):
+        """Add quotes of search, writing them when batch is full."""
+
+        if scraped_at is None:
+            scraped_at = time.time()
+        self.rows.extend(generate_rows(search_params, quotes, scraped_at))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write added quotes in one transaction."""
+
+        if self.rows:
+            with self.conn:
+                self.conn.executemany(INSERT_QUOTE, self.rows)
+            self.rows = []
+
+    def price_series(self, dep_city, arr_city, dep_date, since=0):
+        """Get (scraped_at, lowest price in cents, currency) of searches."""
+
+        self.flush()
+        route = '{0}-{1}'.format(dep_city.upper(), arr_city.upper())
+
+        return self.conn.execute(
+            SELECT_SERIES, [route, iso_date(dep_date), since]).fetchall()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
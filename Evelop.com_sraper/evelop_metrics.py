@@ -0,0 +1,200 @@
+"""Python 3.7. Timing of stages of the scraper of https://www.evelop.com/.
+
+Stages are timed with spans:
+
+    with evelop_metrics.span('get_data_page') as span:
+        response = session.post(url, params)
+        span.add_bytes(len(response.content))
+
+Spans of a stage are aggregated to count, percentiles of time and bytes
+transferred, which are exported as JSON or Prometheus text. Timing is
+off until enable() is called; a disabled span does nothing.
+"""
+
+import json
+import random
+import threading
+import time
+
+MAX_SAMPLES = 10000
+QUANTILES = (0.5, 0.95, 0.99)
+
+ENABLED = False
+STAGES = {}
+LOCK = threading.Lock()
+
+
+class Histogram:
+    """Times of spans of one stage.
+
+    Only MAX_SAMPLES times are kept (reservoir sampling),
+    count, sum and bytes are exact.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.bytes = 0
+        self.samples = []
+
+    def add(self, seconds, size=0):
+        self.count += 1
+        self.total += seconds
+        self.bytes += size
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            number = random.randrange(self.count)
+            if number < MAX_SAMPLES:
+                self.samples[number] = seconds
+
+    def quantile(self, quantile):
+        """Get quantile of times by nearest rank."""
+
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+
+        return samples[min(len(samples) - 1, int(quantile * len(samples)))]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'bytes': self.bytes
+        }
+
+
+class Span:
+    """Time of one stage run."""
+
+    __slots__ = ('stage', 'start', 'bytes')
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.bytes = 0
+        self.start = None
+
+    def add_bytes(self, size):
+        self.bytes += size
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.stage, time.perf_counter() - self.start, self.bytes)
+
+
+class NullSpan:
+    """Span doing nothing, used while timing is off."""
+
+    __slots__ = ()
+
+    def add_bytes(self, size):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def enable():
+    """Turn timing on."""
+
+    global ENABLED
+    ENABLED = True
+
+
+def reset():
+    """Forget all timings."""
+
+    with LOCK:
+        STAGES.clear()
+
+
+def span(stage):
+    """Create span of stage."""
+
+    if not ENABLED:
+        return NULL_SPAN
+
+    return Span(stage)
+
+
+def record(stage, seconds, size=0):
+    """Add time of stage."""
+
+    with LOCK:
+        histogram = STAGES.get(stage)
+        if histogram is None:
+            histogram = STAGES[stage] = Histogram()
+        histogram.add(seconds, size)
+
+
+def summaries():
+    """Get summaries of stages by names of stages."""
+
+    with LOCK:
+        return {stage: STAGES[stage].summary() for stage in sorted(STAGES)}
+
+
+def to_json():
+    """Export summaries of stages as JSON."""
+
+    return json.dumps(summaries(), indent=1)
+
+
+def to_prometheus():
+    """Export summaries of stages in Prometheus text format."""
+
+    lines = [
+        '# HELP evelop_stage_seconds Time of scraper stages.',
+        '# TYPE evelop_stage_seconds summary'
+    ]
+    bytes_lines = [
+        '# HELP evelop_stage_bytes_total Bytes transferred by stages.',
+        '# TYPE evelop_stage_bytes_total counter'
+    ]
+    with LOCK:
+        for stage in sorted(STAGES):
+            histogram = STAGES[stage]
+            for quantile in QUANTILES:
+                lines.append(
+                    'evelop_stage_seconds{{stage="{0}",quantile="{1}"}} '
+                    '{2}'.format(stage, quantile, histogram.quantile(quantile))
+                )
+            lines.append('evelop_stage_seconds_sum{{stage="{0}"}} {1}'.format(
+                stage, histogram.total))
+            lines.append(
+                'evelop_stage_seconds_count{{stage="{0}"}} {1}'.format(
+                    stage, histogram.count)
+            )
+            bytes_lines.append(
+                'evelop_stage_bytes_total{{stage="{0}"}} {1}'.format(
+                    stage, histogram.bytes)
+            )
+
+    return '\n'.join(lines + bytes_lines) + '\n'
+
+
+def write_report(report_format, path=None):
+    """Write report in "json" or "prometheus" format to file or stdout."""
+
+    if report_format == 'prometheus':
+        report = to_prometheus()
+    else:
+        report = to_json() + '\n'
+    if path:
+        with open(path, 'w') as report_file:
+            report_file.write(report)
+    else:
+        print(report, end='')
@@ -0,0 +1,88 @@
+"""Python 3.7. Quotes of the web site https://www.evelop.com/.
+
+A flight (leg) is parsed once and the same Flight object is shared by
+all quotes combining it with other legs, so a round trip search with
+N outbound and M return flights keeps N + M legs, not N * M copies.
+Flights and quotes are immutable, pricing a quote makes a new one.
+"""
+
+from collections import namedtuple
+
+import evelop_prices
+
+DIRECTIONS = ('Outbound', 'Return')
+
+
+class Flight(namedtuple('Flight', (
+        'dep_city', 'arr_city', 'date', 'dep_time', 'arr_time',
+        'flight_time', 'cabin_class'))):
+    """Outbound or return flight of quotes."""
+
+    __slots__ = ()
+
+
+class Quote(namedtuple(
+        'Quote', ('outbound', 'inbound', 'price_cents', 'currency'),
+        defaults=(None, None, None))):
+    """One-way flight or pair of flights of round trip with price."""
+
+    __slots__ = ()
+
+    @property
+    def price(self):
+        """Price like "1234.56 EUR" or None if it is not known."""
+
+        return evelop_prices.format_price(self.price_cents, self.currency)
+
+    @property
+    def legs(self):
+        """Pairs of direction and flight."""
+
+        legs = zip(DIRECTIONS, (self.outbound, self.inbound))
+
+        return [(direction, leg) for direction, leg in legs if leg is not None]
+
+    def with_price(self, price):
+        """Make priced quote from price like "1.234,56 €" of the site."""
+
+        return self._replace(
+            price_cents=evelop_prices.price_to_cents(price),
+            currency=evelop_prices.price_currency(price)
+        )
+
+
+def load_quotes(items):
+    """Convert quotes loaded from JSON (lists) back to Quote objects.
+
+    Equal legs are loaded as one shared Flight.
+    """
+
+    if items is None:
+        return None
+    flights = {}
+
+    def load_flight(fields):
+        if fields is None:
+            return None
+        fields = tuple(fields)
+        flight = flights.get(fields)
+        if flight is None:
+            flight = flights[fields] = Flight(*fields)
+        return flight
+
+    return [
+        item if isinstance(item, Quote) else Quote(
+            load_flight(item[0]), load_flight(item[1]), item[2], item[3])
+        for item in items
+    ]
+
+
+def quote_to_dict(quote):
+    """Convert quote to dict for JSON output."""
+
+    result = {direction: dict(leg._asdict()) for direction, leg in quote.legs}
+    result['price'] = quote.price
+    result['price_cents'] = quote.price_cents
+    result['currency'] = quote.currency
+
+    return result
@@ -0,0 +1,41 @@
+"""Python 3.7. Prices of quotes of the web site https://www.evelop.com/."""
+
+import re
+
+CURRENCY_CODES = {'€': 'EUR', '$': 'USD', '£': 'GBP'}
+
+
+def price_to_cents(price):
+    """Convert price like "1.234,56 €" to integer number of cents."""
+
+    try:
+        amount = re.findall(r'\d[\d.,]*', price)[0]
+    except (IndexError, TypeError):
+        return None
+    cents = int(re.sub(r'\D', '', amount))
+    if re.search(r'[.,]\d{2}$', amount):
+        return cents
+    if re.search(r'[.,]\d$', amount):
+        return cents * 10
+
+    return cents * 100
+
+
+def price_currency(price):
+    """Get ISO code of currency of price like "1.234,56 €"."""
+
+    try:
+        symbol = re.sub(r'[\d.,\s]', '', price)
+    except TypeError:
+        return None
+
+    return CURRENCY_CODES.get(symbol, symbol or None)
+
+
+def format_price(cents, currency):
+    """Convert cents and currency code to price like "1234.56 EUR"."""
+
+    if cents is None:
+        return None
+
+    return '{0}.{1:02d} {2}'.format(cents // 100, cents % 100, currency or '')
@@ -0,0 +1,199 @@
+"""Python 3.7. Record and replay of requests to https://www.evelop.com/.
+
+RecordingAdapter writes every request of a scrape() and its response to
+a fixture directory in the format of evelop_fake_server; ReplayAdapter
+answers requests of sessions from such a directory without network.
+
+Record a search:
+    python evelop_replay.py fixtures/round_trip -f ROUND_TRIP -d MAD -a CUN
+        -d_d 01/08/2030 -r 15/08/2030 -n_a 2 -n_c 0 -n_i 0
+"""
+
+import http.client
+import io
+import itertools
+import json
+import os
+import threading
+
+from urllib.parse import parse_qsl, urlsplit
+
+import urllib3
+from requests.adapters import HTTPAdapter
+
+import evelop_fake_server
+import evelop_scraper
+import evelop_transport
+
+#  Params changing from session to session are not used to find records.
+VOLATILE_PARAMS = {'sesion'}
+
+
+def get_request_params(request):
+    """Get query and form params of prepared request."""
+
+    params = dict(parse_qsl(urlsplit(request.url).query))
+    if request.body:
+        body = request.body
+        if isinstance(body, bytes):
+            body = body.decode()
+        params.update(parse_qsl(body))
+
+    return params
+
+
+class Recorder:
+    """Collect requests and responses and write them to fixture."""
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+        self.records = []
+        self.lock = threading.Lock()
+        os.makedirs(fixture_dir, exist_ok=True)
+
+    def add(self, request, response):
+        """Write body of response and remember the record."""
+
+        with self.lock:
+            body = '{:04d}.html'.format(len(self.records))
+            self.records.append({
+                'method': request.method,
+                'path': urlsplit(request.url).path,
+                'query': {
+                    key: value
+                    for key, value in get_request_params(request).items()
+                    if key not in VOLATILE_PARAMS
+                },
+                'status': response.status_code,
+                'content_type': response.headers.get(
+                    'Content-Type', 'text/html'),
+                'body': body
+            })
+        with open(os.path.join(self.fixture_dir, body), 'wb') as body_file:
+            body_file.write(response.content)
+
+    def save(self, search_params=None):
+        """Write index of records and params of the search."""
+
+        with open(os.path.join(self.fixture_dir, 'index.json'), 'w') as index:
+            json.dump(self.records, index, indent=1)
+        if search_params is not None:
+            search_file = os.path.join(self.fixture_dir, 'search.json')
+            with open(search_file, 'w') as search:
+                json.dump(search_params, search)
+
+
+class RecordingAdapter(evelop_transport.EvelopAdapter):
+    """Transport adapter recording requests and responses."""
+
+    def __init__(self, recorder, **kwargs):
+        self.recorder = recorder
+        super().__init__(**kwargs)
+
+    def send_once(self, request, **kwargs):
+        response = super().send_once(request, **kwargs)
+        self.recorder.add(request, response)
+        return response
+
+
+class OriginalResponse:
+    """Headers of response for cookie extraction of requests."""
+
+    def __init__(self, msg):
+        self.msg = msg
+
+    def isclosed(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Transport adapter answering requests with recorded pages."""
+
+    def __init__(self, fixture, **kwargs):
+        self.fixture = fixture
+        self.session_ids = itertools.count(1)
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        record = self.fixture.find_record(
+            request.method, urlsplit(request.url).path,
+            get_request_params(request)
+        )
+        msg = http.client.HTTPMessage()
+        if record is None:
+            status, content = 404, b''
+        else:
+            status, content = record.get('status', 200), record['content']
+            msg['Content-Type'] = record.get('content_type', 'text/html')
+        if 'IDSESION' not in request.headers.get('Cookie', ''):
+            msg['Set-Cookie'] = 'IDSESION="REPLAY{}"; Path=/'.format(
+                next(self.session_ids))
+        raw = urllib3.HTTPResponse(
+            body=io.BytesIO(content),
+            headers=dict(msg.items()),
+            status=status,
+            preload_content=False,
+            original_response=OriginalResponse(msg)
+        )
+        return self.build_response(request, raw)
+
+
+def load_search_params(fixture_dir):
+    """Load params of the recorded search."""
+
+    with open(os.path.join(fixture_dir, 'search.json')) as search:
+        return json.load(search)
+
+
+def replay_session(fixture):
+    """Create session answered from fixture."""
+
+    session = evelop_scraper.create_session()
+    adapter = ReplayAdapter(fixture)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+
+def record_scrape(search_params, fixture_dir, workers=1):
+    """Scrape and record all requests of the search to fixture."""
+
+    recorder = Recorder(fixture_dir)
+    adapter = evelop_scraper.HTTP_ADAPTER
+    evelop_scraper.HTTP_ADAPTER = RecordingAdapter(recorder)
+    try:
+        evelop_scraper.create_session().get(
+            evelop_scraper.EVELOP_URL + '/', verify=False)
+        quotes = evelop_scraper.scrape(search_params, workers)
+    finally:
+        evelop_scraper.HTTP_ADAPTER = adapter
+    recorder.save(search_params)
+
+    return quotes
+
+
+def replay_scrape(fixture_dir, workers=1):
+    """Scrape the recorded search without network."""
+
+    adapter = evelop_scraper.HTTP_ADAPTER
+    evelop_scraper.HTTP_ADAPTER = ReplayAdapter(
+        evelop_fake_server.Fixture(fixture_dir))
+    try:
+        return evelop_scraper.scrape(load_search_params(fixture_dir), workers)
+    finally:
+        evelop_scraper.HTTP_ADAPTER = adapter
+
+
+if __name__ == '__main__':
+    PARSER = evelop_scraper.create_parser()
+    PARSER.add_argument('fixture_dir', help='input directory for fixture')
+    ARGS = PARSER.parse_args()
+    evelop_scraper.AVAILABLE_ROUTES = evelop_scraper.get_available_routes()
+    QUERY_PARAMS = evelop_scraper.get_query_params_from_command_line(ARGS)
+    if QUERY_PARAMS:
+        QUOTES = record_scrape(QUERY_PARAMS, ARGS.fixture_dir, ARGS.workers)
+        print('Recorded', len(QUOTES or []), 'quotes to', ARGS.fixture_dir)
@@ -0,0 +1,152 @@
+"""Python 3.7. On-disk catalog of routes of the web site https://www.evelop.com/.
+
+The catalog keeps "routesWebSale" of the home page and dates of flights
+of routes (the array following it) with the time they were fetched and
+validators of the response (ETag, Last-Modified). While it is fresh no
+request is sent; after that the page is revalidated with a conditional
+request and downloaded again only if it has changed.
+"""
+
+import json
+import os
+import re
+import time
+
+import requests
+
+import evelop_transport
+
+ROUTES_CACHE = 'routes_cache.json'
+ROUTES_TTL = 24 * 60 * 60
+
+ROUTES_RE = re.compile(r'routesWebSale\s*=\s*')
+#  Assignment of an array right after the end of a statement.
+DATES_RE = re.compile(r';\s*(?:var\s+|let\s+|const\s+)?[\w$.]+\s*=\s*(?=\[)')
+DECODER = json.JSONDecoder()
+
+
+def parse_home_page(page):
+    """Get routes and dates of routes from scripts of the home page.
+
+    Both are decoded in place from the text of the page. Dates are
+    the array assigned by the statement after "routesWebSale", None
+    if there is no such array or it isn't a list of dates of routes.
+    """
+
+    if isinstance(page, bytes):
+        page = page.decode('utf-8', 'replace')
+    match = ROUTES_RE.search(page)
+    if match is None:
+        raise ValueError('No "routesWebSale" on the page.')
+    routes, end = DECODER.raw_decode(page, match.end())
+
+    end_of_statement = page.find(';', end)
+    match = end_of_statement != -1 and DATES_RE.match(page, end_of_statement)
+    if not match:
+        return routes, None
+    try:
+        dates = DECODER.raw_decode(page, match.end())[0]
+    except ValueError:
+        return routes, None
+
+    return routes, dates if is_route_dates(dates) else None
+
+
+def is_route_dates(dates):
+    """Check that dates are a list of dicts with dates of routes."""
+
+    return isinstance(dates, list) and all(
+        isinstance(route, dict)
+        and {'origin', 'destination', 'dates'} <= route.keys()
+        for route in dates
+    )
+
+
+def parse_routes(page):
+    """Get routes from "routesWebSale" script of the home page."""
+
+    return parse_home_page(page)[0]
+
+
+def build_index(routes):
+    """Map departure airport to set of arrival airports."""
+
+    return {
+        dep_airport: frozenset(arr_airports)
+        for dep_airport, arr_airports in routes.items()
+    }
+
+
+def load_catalog(cache_file):
+    """Load catalog from file, return None if there is no valid one."""
+
+    try:
+        with open(cache_file) as catalog_file:
+            catalog = json.load(catalog_file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(catalog, dict) or 'routes' not in catalog or \
+            'dates' not in catalog:
+        return None
+
+    return catalog
+
+
+def save_catalog(cache_file, catalog):
+    """Write catalog to file."""
+
+    temp_file = cache_file + '.tmp'
+    with open(temp_file, 'w') as catalog_file:
+        json.dump(catalog, catalog_file)
+    os.replace(temp_file, cache_file)
+
+
+def fetch_catalog(url, catalog=None):
+    """Download routes, revalidating cached catalog if there is one."""
+
+    headers = {}
+    if catalog:
+        if catalog.get('etag'):
+            headers['If-None-Match'] = catalog['etag']
+        if catalog.get('last_modified'):
+            headers['If-Modified-Since'] = catalog['last_modified']
+
+    response = evelop_transport.create_session().get(
+        url, headers=headers, verify=False)
+    if catalog and response.status_code == 304:
+        return dict(catalog, fetched_at=time.time())
+    response.raise_for_status()
+    routes, dates = parse_home_page(response.content)
+
+    return {
+        'fetched_at': time.time(),
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'routes': routes,
+        'dates': dates or []
+    }
+
+
+def get_catalog(url, cache_file=ROUTES_CACHE, ttl=ROUTES_TTL):
+    """Get catalog with routes and dates from cache or from the web-site."""
+
+    catalog = load_catalog(cache_file)
+    if catalog and time.time() - catalog['fetched_at'] < ttl:
+        return catalog
+
+    try:
+        catalog = fetch_catalog(url, catalog)
+    except requests.RequestException:
+        # Stale routes are better than no routes at all.
+        if not catalog:
+            raise
+    else:
+        save_catalog(cache_file, catalog)
+
+    return catalog
+
+
+def get_route_catalog(url, cache_file=ROUTES_CACHE, ttl=ROUTES_TTL):
+    """Get index of routes from cache or from the web-site."""
+
+    return build_index(get_catalog(url, cache_file, ttl)['routes'])
@@ -2,12 +2,86 @@
 
 import argparse
 import datetime
-import json
+import heapq
+import itertools
+import queue
 import re
-import requests
+import threading
+import time
 import unicodedata
 
-from lxml import html
+import evelop_cache
+import evelop_export
+import evelop_history
+import evelop_metrics
+import evelop_models
+import evelop_routes
+import evelop_sessions
+import evelop_transport
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from lxml import etree, html
+
+EVELOP_URL = 'https://en.evelop.com'
+SECURE_URL = 'https://secure.evelop.com'
+SEARCH_PATH = '/b2c/pages/flight/disponibilidadSubmit.html?'
+VALORACION_PATH = '/b2c/pages/flight/valoracion_esb.html?'
+SELECT_FLIGHT_PATH = '/b2c/pages/flight/availabilitySelectFlight.html?'
+PRICE_PATH = '/b2c/pages/flight/pasajerosReload_esb.html?'
+#  Transport adapter mounted to every new session (None for shared one).
+HTTP_ADAPTER = None
+#  Pool of warm sessions used by searches (None for new ones every time).
+SESSION_POOL = None
+#  Memo of prices of selected flights (None for pricing every time).
+PRICE_MEMO = None
+#  Size of chunks of search results page parsed while it is downloaded.
+CHUNK_SIZE = 16 * 1024
+
+#  Expressions are compiled once, they are evaluated for every flight.
+RESULTS_XPATH = etree.XPath(
+    '/html/body/div[@id="content"]/div/div'
+    '/form[@id="formularioValoracion"]/div/div[@class="flexcols"]'
+    '/section/div[@id="tabs2"]/div/div'
+)
+ONE_WAY_RESULTS_XPATH = etree.XPath(
+    'ol/li/div[@class="vuelo-wrap vuelo-wrap3"]/div[@class="flexcols"]')
+ONE_WAY_ITEM_XPATH = etree.XPath(
+    'div[@class="vuelo-wrap vuelo-wrap3"]/div[@class="flexcols"]')
+ONE_WAY_DATA_XPATH = etree.XPath('div[@class="flexcol-main datos"]/div')
+ONE_WAY_RADIO_XPATH = etree.XPath(
+    'div[@class="flexcol-right acciones3 clearfix"]/div/a/@onclick')
+ROUND_TRIP_RESULTS_XPATH = etree.XPath(
+    'div[@class="wrap-sel-custom combinado"]'
+    '/div[@class="grid-cols clearfix"]/div'
+)
+ROUND_TRIP_DATA_XPATH = etree.XPath(
+    'div[@class="datos"]/div[not(contains(@class, '
+    '"detalles-vuelo-wrap roundedtop clearfix"))]'
+)
+ROUTE_XPATH = etree.XPath(
+    'div[@class="aerolinea"]/text()|div[@class="aerop"]/span/text()')
+DEP_TIME_XPATH = etree.XPath(
+    'div[@class="salida"]/span[@class="hora"]/text()')
+ARR_TIME_XPATH = etree.XPath(
+    'div[@class="llegada"]/span[@class="hora"]/text()')
+CABIN_CLASS_XPATH = etree.XPath(
+    'div[@class="clase"]/span[@class="left clearfix clase"]'
+    '/span[@class="tipo-clase"]/text()|'
+    'div[@class="left clearfix clase "]/span[@class="tipo-clase"]/text()'
+)
+RADIO_XPATH = etree.XPath('div[@class="radio"]/input/@onclick')
+PRICE_XPATH = etree.XPath(
+    '/html/body/aside/div'
+    '/div[@class="box box-color2 rounded ticket-vuelos-precio"]'
+    '/div[@class="subbox rounded escalas"]/div'
+    '/div[@class="line separa total"]'
+    '/div[@class="unit lastUnit t-right precio"]/text()'
+)
+ID_SELECCIONADO_RE = re.compile(r'idSeleccionado=(\d+)')
+PRICE_RE = re.compile(r'([0-9.,]+)\n\s+.(.)')
+ROUTE_SPACES = str.maketrans('', '', ' \n\t')
+RADIO_CHARS = str.maketrans('', '', "'\n")
 
 
 def check_flight_type(flight_type):
@@ -42,7 +116,7 @@ def check_cities(dep_city, arr_city):
         print('No such routes.')
         print('Available routes: ')
         for dep_airport in AVAILABLE_ROUTES:
-            print(dep_airport, 'to', *AVAILABLE_ROUTES[dep_airport])
+            print(dep_airport, 'to', *sorted(AVAILABLE_ROUTES[dep_airport]))
         return False
     elif dep_city == arr_city:
         print("Departure city mustn't be same with arrival city.")
@@ -124,8 +198,22 @@ def check_passengers(adults, children, infants):
     return True
 
 
-def get_query_params_from_command_line():
-    """Parse and check arguments of command line."""
+def positive_int(value):
+    """Convert argument of command line to number greater than zero."""
+
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            '{} is not a positive number'.format(value))
+
+    return number
+
+
+def create_parser():
+    """Create parser of command line arguments."""
 
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -142,8 +230,61 @@ def get_query_params_from_command_line():
     parser.add_argument('-n_c', '--num_child', help='input number of children')
     parser.add_argument(
         '-n_i', '--num_infants', help='input number of infants')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=1,
+        help='input number of sessions used for pricing quotes at once'
+    )
+    parser.add_argument(
+        '-k', '--top_k', type=positive_int,
+        help='input number of the cheapest quotes to find'
+    )
+    parser.add_argument(
+        '-s', '--stream', action='store_true',
+        help='print quotes as soon as they are priced'
+    )
+    parser.add_argument(
+        '-f_o', '--format', choices=('text', 'jsonl', 'csv'), default='text',
+        help='input format of output, "jsonl" and "csv" run one search '
+             'and write quotes as soon as they are priced'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='input file for "jsonl" or "csv" output (".gz" is compressed)'
+    )
+    parser.add_argument(
+        '--cache_ttl', type=int, default=evelop_cache.CACHE_TTL,
+        help='input number of seconds search results are cached for'
+    )
+    parser.add_argument(
+        '--cache_size', type=int, default=evelop_cache.CACHE_SIZE,
+        help='input maximal number of cached search results'
+    )
+    parser.add_argument(
+        '--cache_db',
+        help='input SQLite file for caching search results (the only '
+             'cache of "jsonl" and "csv" output)'
+    )
+    parser.add_argument(
+        '--price_ttl', type=int, default=evelop_cache.PRICE_TTL,
+        help='input number of seconds prices are reused for (0 to disable)'
+    )
+    parser.add_argument(
+        '--history_db', help='input SQLite file for history of quotes')
+    parser.add_argument(
+        '--metrics', choices=('json', 'prometheus'),
+        help='input format of report of stage timings printed at the end'
+    )
+    parser.add_argument(
+        '--metrics_file', help='input file for report of stage timings')
+
+    return parser
+
 
-    args = parser.parse_args()
+def get_query_params_from_command_line(args=None):
+    """Parse and check arguments of command line."""
+
+    if args is None:
+        args = create_parser().parse_args()
 
     if not check_flight_type(args.flight_type):
         return None
@@ -240,16 +381,40 @@ def manual_input():
     }
 
 
-def get_available_routes():
-    """Generate list of available routes."""
+def get_available_routes(ttl=evelop_routes.ROUTES_TTL):
+    """Generate index of available routes."""
+
+    with evelop_metrics.span('get_available_routes'):
+        return evelop_routes.get_route_catalog(
+            EVELOP_URL + '/', evelop_routes.ROUTES_CACHE, ttl)
+
+
+def create_session():
+    """Create session for requests to the web-site."""
+
+    return evelop_transport.create_session(HTTP_ADAPTER)
+
+
+def create_session_pool(size):
+    """Create pool of warm sessions for searches."""
+
+    return evelop_sessions.SessionPool(size, EVELOP_URL + '/', HTTP_ADAPTER)
+
 
-    response = requests.get('https://en.evelop.com/', verify=False).content
+def acquire_session():
+    """Get session from the pool or a new one."""
 
-    routes_json = re.findall(r'routesWebSale = ({.+});', str(response))[0]
-    routes = re.split(';', routes_json)[0]
-    routes_json = json.loads(routes)
+    if SESSION_POOL is None:
+        return create_session()
 
-    return routes_json
+    return SESSION_POOL.acquire()
+
+
+def release_session(session):
+    """Return session to the pool when it is not needed."""
+
+    if SESSION_POOL is not None:
+        SESSION_POOL.release(session)
 
 
 def generate_request_params(search_params):
@@ -272,122 +437,412 @@ def get_data_page(search_params, session):
     """Get html page from web-site."""
 
     params = generate_request_params(search_params)
-    tree = html.fromstring(
-        session.post(
-            'https://en.evelop.com/b2c/pages/flight/'
-            'disponibilidadSubmit.html?',
+    with evelop_metrics.span('get_data_page') as span:
+        content = session.post(
+            EVELOP_URL + SEARCH_PATH,
             params,
             verify=False
         ).content
-    )
+        evelop_sessions.reset_session_id(session)
+        span.add_bytes(len(content))
+    with evelop_metrics.span('parse_data_page'):
+        tree = html.fromstring(content)
 
     return tree
 
 
-def parse_results(data_page, search_params, session):
+def parse_results(data_page, search_params, session, workers=1):
     """Get and generate quotes."""
 
-    try:
-        data = data_page.xpath(
-            '/html/body/div[@id="content"]/div/div'
-            '/form[@id="formularioValoracion"]/div/div[@class="flexcols"]'
-            '/section/div[@id="tabs2"]/div/div'
-        )[0]
-    except IndexError:
-        return None
-    quotes = []
-    if search_params['flight_type'] == 'ONE_WAY':
+    with evelop_metrics.span('parse_results'):
+        with evelop_metrics.span('extract_quotes'):
+            unpriced = extract_quotes(data_page, search_params)
+        if unpriced is None:
+            return None
 
-        results = data.xpath(
-            'ol/li/div[@class="vuelo-wrap vuelo-wrap3"]/div[@class="flexcols"]'
-        )
+        return price_quotes(unpriced, search_params, session, workers)
 
-        for result in results:
-            quote = {}
 
-            flight_data = parse_data_div(
-                result.xpath(
-                    'div[@class="flexcol-main datos"]/div')[0],
-                search_params['flight_type']
-            )
+def extract_quotes(data_page, search_params):
+    """Generate quotes without prices and params for pricing them."""
 
-            flight_data['flight_time'] = generate_flight_time(
-                flight_data['dep_time'], flight_data['arr_time'])
-            flight_data['date'] = search_params['dep_date']
-            quote['Outbound'] = flight_data
-
-            #  Variable "radio_date" using for get price.
-            radio_data = result.xpath(
-                'div[@class="flexcol-right acciones3 clearfix"]/div/a'
-            )[0].get('onclick')
-            radio_data = re.findall(r'idSeleccionado=(\d+)', radio_data)[0]
-
-            flight_data['radio'] = radio_data
-            quote['price'] = get_price(
-                session, search_params, flight_data['radio'])
-            quotes.append(quote)
+    try:
+        data = RESULTS_XPATH(data_page)[0]
+    except IndexError:
+        return None
+    unpriced = []
+    if search_params['flight_type'] == 'ONE_WAY':
+        for result in ONE_WAY_RESULTS_XPATH(data):
+            unpriced.append(parse_one_way_result(result, search_params))
     else:
         # The result consists of two nested lists.
         # The first one contains "outbound" (flight_ob) flights,
         # the second one contains "return" (flight_ib) flights.
-        results = data.xpath(
-            'div[@class="wrap-sel-custom combinado"]'
-            '/div[@class="grid-cols clearfix"]/div'
-        )
-        data_xpath = 'div[@class="datos"]/div[not(contains(@class, ' \
-                     '"detalles-vuelo-wrap roundedtop clearfix"))]'
-        # Generate flights combinations.
+        results = ROUND_TRIP_RESULTS_XPATH(data)
         ob_lst = [
-            parse_data_div(flight) for
-            flight in results[0].xpath(data_xpath)
+            parse_leg(flight, search_params['dep_date']) for
+            flight in ROUND_TRIP_DATA_XPATH(results[0])
         ]
         ib_lst = [
-            parse_data_div(flight) for
-            flight in results[1].xpath(data_xpath)
+            parse_leg(flight, search_params['ret_date']) for
+            flight in ROUND_TRIP_DATA_XPATH(results[1])
         ]
 
-        for flight_ob in ob_lst:
-            for flight_ib in ib_lst:
+        # Generate flights combinations.
+        for leg_ob in ob_lst:
+            for leg_ib in ib_lst:
+                unpriced.append(combine_legs(leg_ob, leg_ib))
 
-                flight_ob['flight_time'] = generate_flight_time(
-                    flight_ob['dep_time'], flight_ob['arr_time'])
-                flight_ib['flight_time'] = generate_flight_time(
-                    flight_ib['dep_time'], flight_ib['arr_time'])
+    return unpriced
 
-                flight_ob['date'] = search_params['dep_date']
-                flight_ib['date'] = search_params['ret_date']
 
-                quotes.append(
-                    {
-                        'Outbound': flight_ob,
-                        'Return': flight_ib,
-                        'price': get_price(
-                            session, search_params,
-                            flight_ob['radio'], flight_ib['radio']
-                        )
-                    }
-                )
+def parse_one_way_result(result, search_params):
+    """Generate one-way quote and params for pricing it."""
 
-    return quotes
+    flight_data = parse_data_div(
+        ONE_WAY_DATA_XPATH(result)[0], search_params['flight_type'])
+
+    #  Variable "radio_date" using for get price.
+    radio_data = ONE_WAY_RADIO_XPATH(result)[0]
+    radio_data = ID_SELECCIONADO_RE.search(radio_data).group(1)
+
+    flight = create_flight(flight_data, search_params['dep_date'])
+
+    return evelop_models.Quote(flight), (radio_data,)
+
+
+def parse_leg(flight, date):
+    """Parse outbound or return flight of round trip.
+
+    Return the flight and params for selecting it in pricing.
+    """
+
+    flight_data = parse_data_div(flight)
+
+    return create_flight(flight_data, date), flight_data['radio']
+
+
+def create_flight(flight_data, date):
+    """Create flight from data parsed from web page."""
+
+    return evelop_models.Flight(
+        flight_data['dep_city'],
+        flight_data['arr_city'],
+        date,
+        flight_data['dep_time'],
+        flight_data['arr_time'],
+        generate_flight_time(flight_data['dep_time'], flight_data['arr_time']),
+        flight_data['cabin_class']
+    )
+
+
+def combine_legs(leg_ob, leg_ib):
+    """Generate round trip quote and params for pricing it.
+
+    Legs are (flight, radio) pairs of parse_leg(), flights are shared
+    by all quotes combining them.
+    """
+
+    return (
+        evelop_models.Quote(leg_ob[0], leg_ib[0]),
+        (leg_ob[1], leg_ib[1])
+    )
+
+
+def stream_data_page(search_params, session, chunk_size=CHUNK_SIZE):
+    """Yield chunks of html page with search results as they arrive."""
+
+    params = generate_request_params(search_params)
+    with evelop_metrics.span('stream_data_page') as span, session.post(
+            EVELOP_URL + SEARCH_PATH,
+            params,
+            verify=False,
+            stream=True) as response:
+        evelop_sessions.reset_session_id(session)
+        for chunk in response.iter_content(chunk_size):
+            span.add_bytes(len(chunk))
+            yield chunk
+
+
+def iter_page_quotes(chunks, search_params):
+    """Parse page by chunks and yield quotes as soon as flights are parsed.
+
+    Parsed elements are removed from the tree, so memory doesn't grow
+    with the size of the page.
+    """
+
+    parser = etree.HTMLPullParser(events=('end',))
+    legs = {'Outbound': [], 'Return': []}
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is None:
+            parser.close()
+        else:
+            parser.feed(chunk)
+        for _, element in parser.read_events():
+            if search_params['flight_type'] == 'ONE_WAY':
+                if element.tag != 'li':
+                    continue
+                for result in ONE_WAY_ITEM_XPATH(element):
+                    yield parse_one_way_result(result, search_params)
+            else:
+                direction = get_leg_direction(element)
+                if direction is None:
+                    continue
+                date = search_params[
+                    'dep_date' if direction == 'Outbound' else 'ret_date']
+                leg = parse_leg(element, date)
+                legs[direction].append(leg)
+                if direction == 'Outbound':
+                    for leg_ib in legs['Return']:
+                        yield combine_legs(leg, leg_ib)
+                else:
+                    for leg_ob in legs['Outbound']:
+                        yield combine_legs(leg_ob, leg)
+            element.clear()
+            parent = element.getparent()
+            while element.getprevious() is not None:
+                del parent[0]
+
+
+def get_leg_direction(element):
+    """Get direction of element if it is a flight of round trip results."""
+
+    parent = element.getparent()
+    if element.tag != 'div' or parent is None or \
+            parent.get('class') != 'datos' or \
+            'detalles-vuelo-wrap roundedtop clearfix' in (
+                element.get('class') or ''):
+        return None
+    column = parent.getparent()
+    grid = column.getparent() if column is not None else None
+    if grid is None or grid.get('class') != 'grid-cols clearfix':
+        return None
+
+    return 'Outbound' if grid.index(column) == 0 else 'Return'
+
+
+class WorkerSessions:
+    """Sessions pricing quotes of a search, one per worker.
+
+    Selected flights are kept by the site in the session, so each
+    worker prices on a session of its own with search results of its
+    own. Pricing starts at once on the session of the search; "extra"
+    sessions are searched in the background and join it when ready.
+    """
+
+    def __init__(self, search_params, session, extra=0):
+        self.search_params = search_params
+        self.free = queue.Queue()
+        self.free.put(session)
+        self.extra_sessions = []
+        self.closed = False
+        self.lock = threading.Lock()
+        self.executor = None
+        if extra > 0:
+            self.executor = ThreadPoolExecutor(max_workers=extra)
+            for _ in range(extra):
+                self.executor.submit(self.warm)
+
+    def warm(self):
+        """Search on a session of the pool and let workers price on it."""
+
+        try:
+            session = acquire_session()
+        except Exception:
+            # Quotes are priced on the sessions there are.
+            return
+        try:
+            get_data_page(self.search_params, session)
+        except Exception:
+            release_session(session)
+            return
+        with self.lock:
+            if not self.closed:
+                self.extra_sessions.append(session)
+                self.free.put(session)
+                return
+        release_session(session)
+
+    def price(self, item):
+        """Price one quote on a free session."""
+
+        quote, params_for_requests = item
+        session = self.free.get()
+        try:
+            return price_quote(
+                session, self.search_params, quote, params_for_requests)
+        finally:
+            self.free.put(session)
+
+    def close(self):
+        """Release extra sessions, those still searching when ready."""
+
+        with self.lock:
+            self.closed = True
+            extra_sessions, self.extra_sessions = self.extra_sessions, []
+        for session in extra_sessions:
+            release_session(session)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def price_quotes(unpriced, search_params, session, workers=1):
+    """Get prices for quotes using up to "workers" sessions at once."""
+
+    workers = max(1, min(workers, len(unpriced)))
+    if workers == 1:
+        return list(iter_quotes(unpriced, search_params, session))
+
+    with WorkerSessions(search_params, session, workers - 1) as sessions:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(sessions.price, unpriced))
+
+
+def iter_quotes(unpriced, search_params, session, workers=1):
+    """Yield quotes as soon as they are priced.
+
+    "unpriced" may be a generator, quotes are priced while it is running.
+    """
+
+    if isinstance(unpriced, list):
+        workers = min(workers, len(unpriced))
+    if workers <= 1:
+        for quote, params_for_requests in unpriced:
+            yield price_quote(
+                session, search_params, quote, params_for_requests)
+        return
+
+    # Parsing of the page goes on while other sessions are searched.
+    with WorkerSessions(search_params, session, workers - 1) as sessions:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = set()
+            try:
+                for item in unpriced:
+                    futures.add(executor.submit(sessions.price, item))
+                    done = {future for future in futures if future.done()}
+                    futures -= done
+                    for future in done:
+                        yield future.result()
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                # The consumer may stop early, quotes left are not needed.
+                for future in futures:
+                    future.cancel()
+
+
+def get_leg_bounds(search_params, workers=1):
+    """Get one-way prices of outbound and return legs.
+
+    Evelop sells a round trip as two one-way fares, so the sum of
+    one-way prices of its legs is a lower bound of a round trip price.
+    """
+
+    return (
+        get_one_way_bounds(
+            dict(search_params, flight_type='ONE_WAY',
+                 ret_date=search_params['dep_date']),
+            workers
+        ),
+        get_one_way_bounds(
+            dict(search_params, flight_type='ONE_WAY',
+                 dep_city=search_params['arr_city'],
+                 arr_city=search_params['dep_city'],
+                 dep_date=search_params['ret_date']),
+            workers
+        )
+    )
+
+
+def get_one_way_bounds(search_params, workers=1, session=None):
+    """Map (dep_time, arr_time) of flights of one-way search to prices."""
+
+    own_session = session is None
+    if own_session:
+        session = acquire_session()
+    leg_bounds = {}
+    try:
+        unpriced = extract_quotes(
+            get_data_page(search_params, session), search_params) or []
+        for quote in iter_quotes(unpriced, search_params, session, workers):
+            key = quote.outbound.dep_time, quote.outbound.arr_time
+            cents = quote.price_cents
+            if cents is not None:
+                leg_bounds[key] = min(cents, leg_bounds.get(key, cents))
+    finally:
+        if own_session:
+            release_session(session)
+
+    return leg_bounds
+
+
+def cheapest_quotes(unpriced, search_params, session, top_k, workers=1,
+                    bounds=None):
+    """Find "top_k" cheapest quotes pricing as few pairs as possible.
+
+    "bounds" are (outbound, return) results of get_one_way_bounds() for
+    a round trip, the legs are searched if they are not given.
+    """
+
+    if search_params['flight_type'] == 'ONE_WAY':
+        quotes = iter_quotes(unpriced, search_params, session, workers)
+        return heapq.nsmallest(
+            top_k,
+            (quote for quote in quotes if quote.price_cents is not None),
+            key=lambda quote: quote.price_cents
+        )
+
+    if not unpriced:
+        return []
+    ob_bounds, ib_bounds = bounds or get_leg_bounds(search_params, workers)
+
+    def bound(item):
+        quote = item[0]
+        ob, ib = quote.outbound, quote.inbound
+        return (
+            ob_bounds.get((ob.dep_time, ob.arr_time), 0) +
+            ib_bounds.get((ib.dep_time, ib.arr_time), 0)
+        )
+
+    # Pairs are priced from the lowest bound up, a batch of
+    # "workers" pairs at a time, until the rest can't beat the best ones.
+    # Sessions of workers are searched once and priced on in every batch.
+    unpriced = sorted(unpriced, key=bound)
+    best = []
+    workers = max(1, min(workers, len(unpriced)))
+    with WorkerSessions(search_params, session, workers - 1) as sessions:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(unpriced), workers):
+                batch = unpriced[start:start + workers]
+                if len(best) == top_k and bound(batch[0]) >= -best[0][0]:
+                    break
+                for quote in executor.map(sessions.price, batch):
+                    cents = quote.price_cents
+                    if cents is None:
+                        continue
+                    item = (-cents, id(quote), quote)
+                    if len(best) < top_k:
+                        heapq.heappush(best, item)
+                    elif cents < -best[0][0]:
+                        heapq.heapreplace(best, item)
+
+    return [quote for _, _, quote in sorted(best, reverse=True)]
 
 
 def parse_data_div(data_div, flight_type='ROUND_TRIP'):
     """Parse div elements with data from web page."""
 
-    route = data_div.xpath(
-        'div[@class="aerolinea"]/text()|div[@class="aerop"]/span/text()'
-    )[0]
-    dep_city, arr_city = route.replace(
-        ' ', '').replace('\n', '').replace('\t', '').split('-')
-    dep_time = data_div.xpath(
-        'div[@class="salida"]/span[@class="hora"]/text()')[0].strip()
-    arr_time = data_div.xpath(
-        'div[@class="llegada"]/span[@class="hora"]/text()')[0].strip()
-    cabin_class = data_div.xpath(
-        'div[@class="clase"]/span[@class="left clearfix clase"]'
-        '/span[@class="tipo-clase"]/text()|'
-        'div[@class="left clearfix clase "]/span[@class="tipo-clase"]/text()'
-    )[0]
+    route = ROUTE_XPATH(data_div)[0]
+    dep_city, arr_city = route.translate(ROUTE_SPACES).split('-')
+    dep_time = DEP_TIME_XPATH(data_div)[0].strip()
+    arr_time = ARR_TIME_XPATH(data_div)[0].strip()
+    cabin_class = CABIN_CLASS_XPATH(data_div)[0]
 
     data_from_div = {
         'dep_city': dep_city,
@@ -398,10 +853,9 @@ def parse_data_div(data_div, flight_type='ROUND_TRIP'):
     }
     if flight_type == 'ROUND_TRIP':
         #  Find the necessary data for query parameters.
-        radio_data = data_div.xpath(
-            'div[@class="radio"]/input')[0].get('onclick')
-        radio_data = radio_data.split('(')[1].replace("'", '').replace(
-            '\n', '').replace(r'\s+', '').split(',')
+        radio_data = RADIO_XPATH(data_div)[0]
+        radio_data = radio_data.split('(')[1].translate(
+            RADIO_CHARS).split(',')
         direction = radio_data[1]
         radio_data = '#'.join(
             radio_data[i].strip() for i in (0, 3, 4))
@@ -414,20 +868,21 @@ def parse_data_div(data_div, flight_type='ROUND_TRIP'):
 def generate_flight_time(dep_time, arr_time):
     """Calculate flight time."""
 
-    dep_time = dep_time.split(':')
-    arr_time = arr_time.split(':')
-    dep_time = datetime.timedelta(
-        hours=float(dep_time[0]), minutes=float(dep_time[1]))
-    arr_time = datetime.timedelta(
-        hours=float(arr_time[0]), minutes=float(arr_time[1]))
+    dep_hours, dep_minutes = dep_time.split(':')
+    arr_hours, arr_minutes = arr_time.split(':')
+    #  Flights arriving after midnight are counted to the next day.
+    minutes = (
+        (int(arr_hours) - int(dep_hours)) * 60 +
+        int(arr_minutes) - int(dep_minutes)
+    ) % (24 * 60)
 
-    return re.findall(r'\w{1,2}:\w{2}', str(arr_time - dep_time))[0]
+    return '{0}:{1:02d}'.format(minutes // 60, minutes % 60)
 
 
-def get_price(session, search_params, *params_for_requests):
-    """Get price for round trip way."""
+def generate_price_params(search_params):
+    """Generate params for valoracion page."""
 
-    param_for_get_price = {
+    return {
         'fechaSalida': search_params['dep_date'],
         'fechaRegreso': search_params['ret_date'],
         'idOrigen': search_params['dep_city'],
@@ -438,78 +893,189 @@ def get_price(session, search_params, *params_for_requests):
         'routeType': search_params['flight_type'],
     }
 
-    id_session = re.findall('IDSESION="(\w+)', str(session.cookies))[0]
-    param_for_price = {'sesion': id_session}
+
+def price_quote(session, search_params, quote, params_for_requests):
+    """Make priced quote, reusing memoized price of its flights."""
+
+    if PRICE_MEMO is not None:
+        key = evelop_cache.price_key(
+            search_params, params_for_requests,
+            [leg for _, leg in quote.legs]
+        )
+        price = PRICE_MEMO.get(key)
+        if price is not None:
+            return quote.with_price(price)
+    price = get_price(session, search_params, *params_for_requests)
+    if PRICE_MEMO is not None and price:
+        PRICE_MEMO.set(key, price)
+
+    return quote.with_price(price)
+
+
+def get_price(session, search_params, *params_for_requests):
+    """Get price for round trip way."""
+
+    with evelop_metrics.span('get_price'):
+        return request_price(session, search_params, *params_for_requests)
+
+
+def request_price(session, search_params, *params_for_requests):
+    """Select flights in the session and get price of them."""
+
+    param_for_get_price = generate_price_params(search_params)
+
+    param_for_price = {'sesion': evelop_sessions.get_session_id(session)}
 
     if search_params['flight_type'] == 'ONE_WAY':
         param_for_get_price['idSeleccionado'] = params_for_requests[0]
-        session.get(
-            'https://en.evelop.com/b2c/pages/flight/valoracion_esb.html?',
+        timed_get(
+            session, 'get_price.valoracion',
+            EVELOP_URL + VALORACION_PATH,
             params=param_for_get_price
         )
-        get_price_request = session.get(
-            'https://secure.evelop.com/b2c/pages/flight'
-            '/pasajerosReload_esb.html?',
+        get_price_request = timed_get(
+            session, 'get_price.pasajeros_reload',
+            SECURE_URL + PRICE_PATH,
             params=param_for_price
         )
 
-        tree = html.fromstring(get_price_request.content)
-        price = tree.xpath(
-            '/html/body/aside/div'
-            '/div[@class="box box-color2 rounded ticket-vuelos-precio"]'
-            '/div[@class="subbox rounded escalas"]/div'
-            '/div[@class="line separa total"]'
-            '/div[@class="unit lastUnit t-right precio"]/text()')
-        price = unicodedata.normalize(
-            'NFKC', ''.join(price)
-        ).encode('latin-1').decode('utf-8').replace('\n', '').replace('  ', '')
+        price = parse_price_page(get_price_request.content, 'ONE_WAY')
     else:
-        session.get(
-            'https://en.evelop.com/b2c/pages/flight/valoracion_esb.html?',
+        timed_get(
+            session, 'get_price.valoracion',
+            EVELOP_URL + VALORACION_PATH,
             params=param_for_get_price
         )
         for param in params_for_requests:
-            session.get(
-                'https://en.evelop.com/b2c/pages/flight/'
-                'availabilitySelectFlight.html?',
+            timed_get(
+                session, 'get_price.select_flight',
+                EVELOP_URL + SELECT_FLIGHT_PATH,
                 params=param,
                 verify=False
             )
 
-        session.get(
-            'https://en.evelop.com/b2c/pages/flight/valoracion_esb.html?',
+        timed_get(
+            session, 'get_price.valoracion',
+            EVELOP_URL + VALORACION_PATH,
             params=param_for_get_price)
 
-        get_price_request = session.get(
-            'https://secure.evelop.com/b2c/pages/flight/pasajerosReload_esb.html?',
+        get_price_request = timed_get(
+            session, 'get_price.pasajeros_reload',
+            SECURE_URL + PRICE_PATH,
             params=param_for_price).text
 
-        tree = html.fromstring(get_price_request)
+        price = parse_price_page(get_price_request, 'ROUND_TRIP')
+
+    return price
+
+
+def timed_get(session, stage, url, **kwargs):
+    """Send GET request timed as stage."""
+
+    with evelop_metrics.span(stage) as span:
+        response = session.get(url, **kwargs)
+        span.add_bytes(len(response.content))
+
+    return response
+
 
-        price = ''.join(tree.xpath(
-            '/html/body/aside/div'
-            '/div[@class="box box-color2 rounded ticket-vuelos-precio"]'
-            '/div[@class="subbox rounded escalas"]/div'
-            '/div[@class="line separa total"]'
-            '/div[@class="unit lastUnit t-right precio"]/text()'
-        )).strip()
-        price = ' '.join(re.findall(r'([0-9.,]+)\n\s+.(.)', price)[0])
+def parse_price_page(page, flight_type):
+    """Get price from pasajerosReload page."""
+
+    price = PRICE_XPATH(html.fromstring(page))
+    if flight_type == 'ONE_WAY':
+        price = unicodedata.normalize(
+            'NFKC', ''.join(price)
+        ).encode('latin-1').decode('utf-8').replace('\n', '').replace('  ', '')
+    else:
+        price = ''.join(price).strip()
+        price = ' '.join(PRICE_RE.findall(price)[0])
 
     return price
 
 
-def scrape(search_params):
+def scrape(search_params, workers=1, top_k=None, cache=None, session=None):
     """Get search params if necessary and return quotes."""
 
     if not search_params:
         search_params = manual_input()
-    session = requests.session()
-    data_page = get_data_page(search_params, session)
-    quotes = parse_results(data_page, search_params, session)
+    if cache is not None:
+        key = evelop_cache.search_key(search_params, top_k=top_k)
+        quotes = evelop_models.load_quotes(cache.get(key))
+        if quotes is not None:
+            return quotes
+    own_session = session is None
+    if own_session:
+        session = acquire_session()
+    try:
+        quotes = search_quotes(search_params, session, workers, top_k)
+    finally:
+        if own_session:
+            release_session(session)
+    if cache is not None and quotes is not None:
+        cache.set(key, quotes)
 
     return quotes
 
 
+def search_quotes(search_params, session, workers=1, top_k=None):
+    """Search on session and return priced quotes."""
+
+    data_page = get_data_page(search_params, session)
+    if top_k:
+        unpriced = extract_quotes(data_page, search_params)
+        if unpriced is None:
+            return None
+        return cheapest_quotes(
+            unpriced, search_params, session, top_k, workers)
+
+    return parse_results(data_page, search_params, session, workers)
+
+
+def iter_scrape(search_params, workers=1, cache=None):
+    """Get search params if necessary and yield quotes as they are priced.
+
+    Results page is parsed while it is downloaded and pricing starts
+    as soon as the first flights are parsed.
+    """
+
+    if not search_params:
+        search_params = manual_input()
+    if cache is not None:
+        key = evelop_cache.search_key(search_params, top_k=None)
+        quotes = evelop_models.load_quotes(cache.get(key))
+        if quotes is not None:
+            yield from quotes
+            return
+    session = acquire_session()
+    page_order = {}
+
+    def remember_order(unpriced):
+        for item in unpriced:
+            page_order[order_key(item[0])] = len(page_order)
+            yield item
+
+    def order_key(quote):
+        # Priced quote is a new object, but its legs are the same.
+        return id(quote.outbound), id(quote.inbound)
+
+    unpriced = remember_order(iter_page_quotes(
+        stream_data_page(search_params, session), search_params))
+    # Quotes are kept only to be cached, otherwise they are not held.
+    quotes = [] if cache is not None else None
+    try:
+        for quote in iter_quotes(unpriced, search_params, session, workers):
+            if quotes is not None:
+                quotes.append(quote)
+            yield quote
+    finally:
+        release_session(session)
+    if cache is not None:
+        # Stored in order of the page, like results of scrape().
+        cache.set(key, sorted(
+            quotes, key=lambda quote: page_order[order_key(quote)]))
+
+
 def print_results(quotes):
     """Print results."""
 
@@ -520,30 +1086,85 @@ def print_results(quotes):
         )
     else:
         for quote in quotes:
-            for key, value in quote.items():
-                if key != 'price':
-                    print(key, '\n')
-                    print(
-                        'Route: {0} - {1}'.format(
-                            value['dep_city'], value['arr_city'])
-                    )
-                    print('Date:', value['date'])
-                    print('Departure time:', value['dep_time'])
-                    print('Arrival time:', value['arr_time'])
-                    print('Flight time:', value['flight_time'])
-                    print('Class:', value['cabin_class'], '\n')
-            print('Price:', quote['price'])
-            print('-------------------------------------------')
+            print_quote(quote)
+
+
+def print_quote(quote):
+    """Print one quote."""
+
+    for direction, flight in quote.legs:
+        print(direction, '\n')
+        print('Route: {0} - {1}'.format(flight.dep_city, flight.arr_city))
+        print('Date:', flight.date)
+        print('Departure time:', flight.dep_time)
+        print('Arrival time:', flight.arr_time)
+        print('Flight time:', flight.flight_time)
+        print('Class:', flight.cabin_class, '\n')
+    print('Price:', quote.price)
+    print('-------------------------------------------')
 
 
 if __name__ == '__main__':
+    ARGS = create_parser().parse_args()
+    if ARGS.metrics:
+        evelop_metrics.enable()
+    HTTP_ADAPTER = evelop_transport.EvelopAdapter(
+        pool_maxsize=max(evelop_transport.POOL_SIZE, ARGS.workers))
+    #  Sessions are warmed while routes are loaded and params are entered.
+    SESSION_POOL = create_session_pool(ARGS.workers)
+    if ARGS.price_ttl > 0:
+        PRICE_MEMO = evelop_cache.MemoryCache(
+            evelop_cache.PRICE_MEMO_SIZE, ARGS.price_ttl)
     AVAILABLE_ROUTES = get_available_routes()
-    QUERY_PARAMS = get_query_params_from_command_line()
+    QUERY_PARAMS = get_query_params_from_command_line(ARGS)
+    HISTORY = None
+    if ARGS.history_db:
+        HISTORY = evelop_history.QuoteHistory(ARGS.history_db)
+    WRITER = None
+    if ARGS.format != 'text':
+        WRITER = evelop_export.create_writer(ARGS.format, ARGS.output)
+    #  Exported quotes are not held in memory for a cache of its own.
+    CACHE = None
+    if WRITER is None or ARGS.cache_db:
+        CACHE = evelop_cache.create_cache(
+            ARGS.cache_db, ARGS.cache_size, ARGS.cache_ttl)
     while True:
-        QUOTES = scrape(QUERY_PARAMS)
-        print_results(QUOTES)
+        if not QUERY_PARAMS:
+            QUERY_PARAMS = manual_input()
+        if (ARGS.stream or WRITER is not None) and not ARGS.top_k:
+            QUOTES = iter_scrape(QUERY_PARAMS, ARGS.workers, CACHE)
+        else:
+            QUOTES = scrape(
+                QUERY_PARAMS, ARGS.workers, ARGS.top_k, CACHE) or []
+        SCRAPED_AT = time.time()
+        FOUND = 0
+        for QUOTE in QUOTES:
+            FOUND += 1
+            if WRITER is None:
+                print_quote(QUOTE)
+            else:
+                WRITER.write(QUOTE)
+            if HISTORY is not None:
+                HISTORY.add(QUERY_PARAMS, [QUOTE], SCRAPED_AT)
+        if WRITER is not None:
+            break
+        if not FOUND:
+            print_results(None)
         QUERY_PARAMS = None
         if input(
             'Enter "EXIT" to close program. For continue press "Enter". '
         ).upper() == 'EXIT':
             break
+    SESSION_POOL.close()
+    if WRITER is not None:
+        WRITER.close()
+    if HISTORY is not None:
+        HISTORY.close()
+    #  Stdout is left for quotes exported to it.
+    if WRITER is None or ARGS.output not in (None, '-'):
+        if CACHE is not None:
+            evelop_cache.print_stats(CACHE)
+        if PRICE_MEMO is not None:
+            evelop_cache.print_stats(PRICE_MEMO, 'Price memo')
+    if ARGS.metrics:
+        evelop_metrics.write_report(ARGS.metrics, ARGS.metrics_file)
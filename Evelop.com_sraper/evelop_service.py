@@ -0,0 +1,287 @@
+"""Python 3.7. Local JSON service of searches on https://www.evelop.com/.
+
+Searches are run by a pool of workers on sessions of a warm pool.
+Clients asking for the same search at the same time share one run of
+it, and results are cached for --cache_ttl seconds.
+
+    POST /search   {"flight_type": "ROUND_TRIP", "dep_city": "MAD",
+                    "arr_city": "CUN", "dep_date": "01/08/2030",
+                    "ret_date": "15/08/2030", "adults": 2, "top_k": 5}
+    GET /search?flight_type=ONE_WAY&dep_city=MAD&...
+    GET /metrics   (Prometheus text, add ?format=json for JSON)
+"""
+
+import argparse
+import json
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import evelop_batch
+import evelop_cache
+import evelop_metrics
+import evelop_models
+import evelop_scraper
+import evelop_transport
+
+WORKERS = 4
+#  Values of gauges() only growing with time.
+COUNTERS = {'shared_searches', 'cache_hits', 'cache_misses'}
+
+
+class SingleFlight:
+    """Share one run of a call between callers asking for it at once."""
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.shared = 0
+
+    def submit(self, key, submit):
+        """Get future of the running call of key or start it by submit()."""
+
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future
+            future = self.calls[key] = submit()
+        future.add_done_callback(lambda done: self.forget(key, done))
+
+        return future
+
+    def forget(self, key, future):
+        """Remove finished call, next callers will start a new one."""
+
+        with self.lock:
+            if self.calls.get(key) is future:
+                del self.calls[key]
+
+
+class SearchService:
+    """Pool of workers running searches."""
+
+    def __init__(self, workers=WORKERS, pricing_workers=1, cache=None):
+        self.pricing_workers = pricing_workers
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.single_flight = SingleFlight()
+        self.lock = threading.Lock()
+        self.queued = self.running = 0
+
+    def search(self, search_params, top_k=None):
+        """Get quotes of search from cache or by a run shared by callers."""
+
+        key = evelop_cache.search_key(search_params, top_k=top_k)
+        if self.cache is not None:
+            quotes = evelop_models.load_quotes(self.cache.get(key))
+            if quotes is not None:
+                return quotes
+
+        def submit():
+            with self.lock:
+                self.queued += 1
+            return self.executor.submit(
+                self.run, key, search_params, top_k, time.perf_counter())
+
+        return self.single_flight.submit(key, submit).result()
+
+    def run(self, key, search_params, top_k, queued_at):
+        """Run search on a session of evelop_scraper.SESSION_POOL."""
+
+        evelop_metrics.record(
+            'service.queue_wait', time.perf_counter() - queued_at)
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            quotes = evelop_scraper.scrape(
+                search_params, self.pricing_workers, top_k)
+        finally:
+            with self.lock:
+                self.running -= 1
+        if self.cache is not None and quotes is not None:
+            self.cache.set(key, quotes)
+
+        return quotes
+
+    def gauges(self):
+        """Get current state of the service."""
+
+        with self.lock:
+            gauges = {'queue_depth': self.queued, 'running': self.running}
+        gauges['shared_searches'] = self.single_flight.shared
+        if self.cache is not None:
+            stats = self.cache.stats()
+            gauges['cache_hits'] = stats['hits']
+            gauges['cache_misses'] = stats['misses']
+
+        return gauges
+
+    def to_prometheus(self):
+        """Export stage timings and state of the service."""
+
+        lines = []
+        for name, value in self.gauges().items():
+            metric_type = 'counter' if name in COUNTERS else 'gauge'
+            lines.append(
+                '# TYPE evelop_service_{0} {1}'.format(name, metric_type))
+            lines.append('evelop_service_{0} {1}'.format(name, value))
+
+        return evelop_metrics.to_prometheus() + '\n'.join(lines) + '\n'
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """Answer search and metrics requests with JSON."""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        if url.path == '/search':
+            self.search(params)
+        elif url.path == '/metrics':
+            service = self.server.service
+            if params.get('format') == 'json':
+                self.send_json(200, {
+                    'stages': evelop_metrics.summaries(),
+                    'service': service.gauges()
+                })
+            else:
+                self.send_body(
+                    200, service.to_prometheus().encode(), 'text/plain')
+        else:
+            self.send_json(404, {'error': 'Not found.'})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/search':
+            self.send_json(404, {'error': 'Not found.'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            spec = json.loads(self.rfile.read(length).decode() or '{}')
+        except ValueError:
+            self.send_json(400, {'error': 'Body must be a JSON object.'})
+            return
+        if not isinstance(spec, dict):
+            self.send_json(400, {'error': 'Body must be a JSON object.'})
+            return
+        self.search(spec)
+
+    def search(self, spec):
+        with evelop_metrics.span('service.request'):
+            top_k = spec.get('top_k')
+            if top_k is not None and top_k != '':
+                try:
+                    top_k = int(top_k)
+                except (TypeError, ValueError):
+                    top_k = 0
+                if top_k < 1:
+                    self.send_json(
+                        400, {'error': 'top_k must be a positive number.'})
+                    return
+            else:
+                top_k = None
+            search_params = evelop_batch.check_spec(spec)
+            if search_params is None:
+                self.send_json(400, {'error': 'Invalid search params.'})
+                return
+            try:
+                quotes = self.server.service.search(search_params, top_k)
+            except Exception as error:
+                self.send_json(502, {'error': repr(error)})
+                return
+            self.send_json(200, {
+                'search': search_params,
+                'quotes': [
+                    evelop_models.quote_to_dict(quote)
+                    for quote in quotes or []
+                ]
+            })
+
+    def send_json(self, status, data):
+        self.send_body(status, json.dumps(data).encode(), 'application/json')
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SearchServer(ThreadingHTTPServer):
+    """HTTP server of the search service."""
+
+    daemon_threads = True
+
+    def __init__(self, service, host='127.0.0.1', port=0):
+        super().__init__((host, port), SearchHandler)
+        self.service = service
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}'.format(*self.server_address)
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--host', default='127.0.0.1')
+    PARSER.add_argument('-p', '--port', type=int, default=8080)
+    PARSER.add_argument(
+        '-w', '--workers', type=int, default=WORKERS,
+        help='input number of searches run at once'
+    )
+    PARSER.add_argument(
+        '--pricing_workers', type=int, default=1,
+        help='input number of sessions used for pricing quotes of a search'
+    )
+    PARSER.add_argument(
+        '--price_ttl', type=int, default=evelop_cache.PRICE_TTL,
+        help='input number of seconds prices are reused for (0 to disable)'
+    )
+    PARSER.add_argument(
+        '--cache_ttl', type=int, default=evelop_cache.CACHE_TTL,
+        help='input number of seconds search results are cached for'
+    )
+    PARSER.add_argument(
+        '--cache_size', type=int, default=evelop_cache.CACHE_SIZE,
+        help='input maximal number of cached search results'
+    )
+    PARSER.add_argument(
+        '--cache_db', help='input SQLite file for caching search results'
+    )
+    ARGS = PARSER.parse_args()
+
+    evelop_metrics.enable()
+    evelop_scraper.HTTP_ADAPTER = evelop_transport.EvelopAdapter(
+        pool_maxsize=ARGS.workers * ARGS.pricing_workers)
+    evelop_scraper.SESSION_POOL = evelop_scraper.create_session_pool(
+        ARGS.workers * ARGS.pricing_workers)
+    if ARGS.price_ttl > 0:
+        evelop_scraper.PRICE_MEMO = evelop_cache.MemoryCache(
+            evelop_cache.PRICE_MEMO_SIZE, ARGS.price_ttl)
+    evelop_scraper.AVAILABLE_ROUTES = evelop_scraper.get_available_routes()
+    SERVICE = SearchService(
+        ARGS.workers,
+        ARGS.pricing_workers,
+        evelop_cache.create_cache(
+            ARGS.cache_db, ARGS.cache_size, ARGS.cache_ttl)
+    )
+    SERVER = SearchServer(SERVICE, ARGS.host, ARGS.port)
+    print('Serving searches on', SERVER.url)
+    try:
+        SERVER.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    SERVER.server_close()
+    SERVICE.close()
+    evelop_scraper.SESSION_POOL.close()
@@ -0,0 +1,132 @@
+"""Python 3.7. Pool of sessions of the web site https://www.evelop.com/.
+
+Sessions are created and warmed (cookies of the site are got) in the
+background ahead of demand, so a search doesn't wait for it; when none
+is ready, a cold session is given at once. Id of the site session is
+parsed from cookies once per search and kept on the session. Sessions
+idle for longer than the site keeps them are dropped.
+"""
+
+import collections
+import re
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import evelop_transport
+
+#  Seconds a session may stay unused before the site forgets it.
+IDLE_TIMEOUT = 10 * 60
+
+SESSION_ID_RE = re.compile(r'IDSESION="(\w+)')
+
+
+class NoSessionIdError(requests.RequestException):
+    """The site has not set IDSESION cookie of the session."""
+
+
+def get_session_id(session):
+    """Get id of session on the web site, parsing cookies only once."""
+
+    session_id = getattr(session, 'evelop_id', None)
+    if session_id is None:
+        match = SESSION_ID_RE.search(str(session.cookies))
+        if match is None:
+            raise NoSessionIdError(
+                'The site has not set IDSESION cookie of the session.')
+        session_id = session.evelop_id = match.group(1)
+
+    return session_id
+
+
+def reset_session_id(session):
+    """Forget id of session, the site may have set a new one."""
+
+    session.evelop_id = None
+
+
+class SessionPool:
+    """Up to "size" sessions, those not in use are kept warm for searches.
+
+    Sessions share the transport adapter, so they are never closed
+    (it would close connections of all sessions), only dropped.
+    """
+
+    def __init__(self, size, warm_url, adapter=None,
+                 idle_timeout=IDLE_TIMEOUT):
+        self.size = size
+        self.warm_url = warm_url
+        self.adapter = adapter
+        self.idle_timeout = idle_timeout
+        self.idle = collections.deque()
+        self.warming = self.in_use = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=size)
+        self.fill()
+
+    def warm(self):
+        """Create session with cookies of the web site."""
+
+        session = evelop_transport.create_session(self.adapter)
+        session.get(self.warm_url, verify=False)
+        session.evelop_used_at = time.monotonic()
+
+        return session
+
+    def fill(self):
+        """Start warming sessions missing in the pool."""
+
+        with self.lock:
+            missing = (
+                self.size - len(self.idle) - self.warming - self.in_use)
+            self.warming += max(0, missing)
+        for _ in range(missing):
+            self.executor.submit(self.add_warm)
+
+    def add_warm(self):
+        try:
+            session = self.warm()
+        except requests.RequestException:
+            # The next acquire() starts warming a session again.
+            session = None
+        with self.lock:
+            self.warming -= 1
+            if session is not None:
+                self.idle.append(session)
+
+    def acquire(self):
+        """Get warm session, a cold one if pool is empty."""
+
+        now = time.monotonic()
+        session = None
+        with self.lock:
+            while self.idle and \
+                    now - self.idle[0].evelop_used_at >= self.idle_timeout:
+                self.idle.popleft()
+            if self.idle:
+                # The most recently used session is the least likely
+                # to be expired by the site.
+                session = self.idle.pop()
+            self.in_use += 1
+        self.fill()
+        if session is None:
+            # The search itself gets cookies of the site, waiting for
+            # the home page first would only delay it.
+            session = evelop_transport.create_session(self.adapter)
+
+        return session
+
+    def release(self, session):
+        """Return session to the pool."""
+
+        session.evelop_used_at = time.monotonic()
+        with self.lock:
+            self.in_use -= 1
+            if len(self.idle) + self.in_use < self.size:
+                self.idle.append(session)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
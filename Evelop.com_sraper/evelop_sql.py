@@ -1,13 +1,115 @@
 """Python 3.7. Database of flight schedule."""
 
 import argparse
+import contextlib
 import datetime
-import json
+import evelop_routes
 import evelop_scraper
 import re
-import requests
-import os
 import sqlite3
+import threading
+
+from collections import namedtuple
+
+DATABASE = 'fly_database.db'
+#  WAL lets lookups run while schedules are written, and with it
+#  synchronous=NORMAL doesn't wait for fsync on every commit.
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY'
+)
+#  Migrations of the schema, MIGRATIONS[n] upgrades database from
+#  version n (PRAGMA user_version) to version n + 1.
+MIGRATIONS = (
+    # Table of the first versions of the script.
+    (
+        'CREATE TABLE IF NOT EXISTS Flight_schedule(ID INTEGER PRIMARY '
+        'KEY AUTOINCREMENT, Dep_airport, Arr_airport, flight_schedule)',
+    ),
+    # Typed columns and one row per route, the latest one is kept.
+    (
+        'CREATE TABLE Flight_schedule_new(ID INTEGER PRIMARY KEY '
+        'AUTOINCREMENT, Dep_airport TEXT NOT NULL, Arr_airport TEXT NOT '
+        'NULL, flight_schedule TEXT NOT NULL)',
+        'INSERT INTO Flight_schedule_new SELECT ID, Dep_airport, '
+        'Arr_airport, flight_schedule FROM Flight_schedule WHERE ID IN '
+        '(SELECT MAX(ID) FROM Flight_schedule '
+        'GROUP BY Dep_airport, Arr_airport)',
+        'DROP TABLE Flight_schedule',
+        'ALTER TABLE Flight_schedule_new RENAME TO Flight_schedule',
+        'CREATE UNIQUE INDEX Flight_schedule_route '
+        'ON Flight_schedule(Dep_airport, Arr_airport)',
+    ),
+    # UTC time schedule was got from the page at, NULL if unknown.
+    (
+        'ALTER TABLE Flight_schedule ADD COLUMN last_refreshed TEXT',
+    ),
+    # Days of flights of route in year, bit n of "days" (little-endian)
+    # is set if there are flights on day n + 1 of the year.
+    (
+        'CREATE TABLE Flight_days(Dep_airport TEXT NOT NULL, Arr_airport '
+        'TEXT NOT NULL, year INTEGER NOT NULL, days BLOB NOT NULL, '
+        'PRIMARY KEY(Dep_airport, Arr_airport, year)) WITHOUT ROWID',
+    ),
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+UPSERT_SCHEDULE = (
+    'INSERT INTO Flight_schedule(Dep_airport, Arr_airport, '
+    'flight_schedule, last_refreshed) VALUES (?, ?, ?, CURRENT_TIMESTAMP) '
+    'ON CONFLICT(Dep_airport, Arr_airport) DO UPDATE SET '
+    'flight_schedule=excluded.flight_schedule, '
+    'last_refreshed=excluded.last_refreshed'
+)
+SELECT_SCHEDULE = (
+    'SELECT Dep_airport, Arr_airport, flight_schedule, last_refreshed '
+    'FROM Flight_schedule WHERE Dep_airport=? AND Arr_airport=?'
+)
+DELETE_DAYS = (
+    'DELETE FROM Flight_days WHERE Dep_airport=? AND Arr_airport=?'
+)
+INSERT_DAYS = (
+    'INSERT INTO Flight_days(Dep_airport, Arr_airport, year, days) '
+    'VALUES (?, ?, ?, ?)'
+)
+SELECT_DEPARTURE_DAYS = (
+    'SELECT Arr_airport, year, days FROM Flight_days '
+    'WHERE Dep_airport=? AND year BETWEEN ? AND ?'
+)
+SELECT_ROUTE_DAYS = (
+    'SELECT year, days FROM Flight_days WHERE Dep_airport=? '
+    'AND Arr_airport=? AND year>=? ORDER BY year'
+)
+#  Bytes of bitmap of days of year, enough for 366 days.
+YEAR_BYTES = 46
+
+#  Dates of flights of route in format of the page ("dd-mm-YYYY"),
+#  days of week of them (bit n is set if there are flights on day n)
+#  and bitmaps of days of year by years.
+RouteDates = namedtuple('RouteDates', ('dates', 'weekdays', 'days'))
+
+
+def day_range_mask(year, first_date, last_date):
+    """Get bitmap of days of year between dates, both included."""
+
+    first_date = max(first_date, datetime.date(year, 1, 1))
+    last_date = min(last_date, datetime.date(year, 12, 31))
+    if first_date > last_date:
+        return 0
+    first_day = first_date.timetuple().tm_yday - 1
+
+    return ((1 << (last_date - first_date).days + 1) - 1) << first_day
+
+
+def iter_days(year, bitmap):
+    """Yield dates of set bits of bitmap of days of year in order."""
+
+    while bitmap:
+        lowest_bit = bitmap & -bitmap
+        yield datetime.date(year, 1, 1) + datetime.timedelta(
+            lowest_bit.bit_length() - 1)
+        bitmap ^= lowest_bit
 
 
 def check_cities(dep_city, arr_city):
@@ -28,7 +130,10 @@ def check_cities(dep_city, arr_city):
         print('No such routes.')
         print('Available routes: ')
         for dep_airport in AVAILABLE_ROUTES:
-            print(dep_airport, 'to', AVAILABLE_ROUTES[dep_airport])
+            print(
+                dep_airport, 'to',
+                ', '.join(sorted(AVAILABLE_ROUTES[dep_airport]))
+            )
         return False
     elif dep_city == arr_city:
         print("Departure city mustn't be same with arrival city.")
@@ -62,14 +167,30 @@ def manual_input():
     return {'dep_city': dep_city, 'arr_city': arr_city, 'dep_date': dep_date}
 
 
-def input_query_params():
-    """Parse and check arguments of command line."""
+def create_parser():
+    """Create parser of arguments of command line."""
 
     parser = argparse.ArgumentParser()
     parser.add_argument('-d', '--dep_city', help='Input departure city.')
     parser.add_argument('-a', '--arr_city', help='Input arrival city.')
     parser.add_argument('-d_d', '--dep_date', help='Input departure date.')
-    args = parser.parse_args()
+    parser.add_argument(
+        '--sync_all', action='store_true',
+        help='Load schedules of all routes into the table and exit.'
+    )
+    parser.add_argument(
+        '-n', '--next_dates', type=int, default=0,
+        help='Input number of next departure dates to print.'
+    )
+
+    return parser
+
+
+def input_query_params(args=None):
+    """Parse and check arguments of command line."""
+
+    if args is None:
+        args = create_parser().parse_args()
     try:
         dep_city = args.dep_city.upper()
         arr_city = args.arr_city.upper()
@@ -80,24 +201,43 @@ def input_query_params():
     if not evelop_scraper.check_dates(args.dep_date):
         return None
 
-    return dep_city, arr_city
-
-
-def find_available_dates():
-    """Get available dates from page."""
-
-    # must check regex
-    response = requests.get('https://en.evelop.com/').content
-    dates = re.findall(r'routesWebSale = ({.+});', str(response))[0]
-    dates = re.split(';', dates)[1]
-    dates = re.findall(r'\[(.+)]', dates)[0]
-    dates = re.sub(r'}(,){', ' ', dates).split()
-    list_of_dicts = []
-    for flight in dates:
-        flight = re.search(r'[^{](.+)[^}]', flight).group()
-        list_of_dicts.append(json.loads('{' + flight + '}'))
-
-    return list_of_dicts
+    return {
+        'dep_city': dep_city,
+        'arr_city': arr_city,
+        'dep_date': args.dep_date
+    }
+
+
+def index_schedules(flights):
+    """Index RouteDates of routes of the page by (origin, destination)."""
+
+    #  The same dates are in many routes, each one is parsed once.
+    parsed_dates = {}
+    index = {}
+    for flight in flights:
+        route = flight['origin'], flight['destination']
+        route_dates = index.get(route)
+        if route_dates is not None:
+            mask = route_dates.weekdays
+            dates = route_dates.dates.union(flight['dates'])
+            days = route_dates.days
+        else:
+            mask = 0
+            dates = frozenset(flight['dates'])
+            days = {}
+        for date in flight['dates']:
+            parsed_date = parsed_dates.get(date)
+            if parsed_date is None:
+                parsed_date = parsed_dates[date] = \
+                    datetime.datetime.strptime(date, '%d-%m-%Y').timetuple()
+            mask |= 1 << parsed_date.tm_wday
+            days[parsed_date.tm_year] = (
+                days.get(parsed_date.tm_year, 0) |
+                1 << parsed_date.tm_yday - 1
+            )
+        index[route] = RouteDates(dates, mask, days)
+
+    return index
 
 
 def find_info_on_query(search_params):
@@ -106,71 +246,184 @@ def find_info_on_query(search_params):
     #  Converting the entered date into a format suitable
     #  for comparison with data on the site.
     dep_date = re.sub(r'[./]', '-', search_params['dep_date'])
-    dep_day_list = ['-', '-', '-', '-', '-', '-', '-']
-    for flight in DICT_WITH_DATES:
-        if search_params['dep_city'] == flight['origin'] and \
-                search_params['arr_city'] == flight['destination'] and \
-                dep_date in flight['dates']:
-            for date in flight['dates']:
-                date = datetime.datetime.strptime(date, '%d-%m-%Y')
-                day = datetime.datetime.weekday(date)
-                dep_day_list[day] = '+'
-            flight_dict = {
-                'dep_city': flight['origin'],
-                'arr_city': flight['destination'],
-                'schedule': ''.join(dep_day_list)
-            }
-
-            return flight_dict
-
-
-def create_table():
-    """Create table in database."""
-
-    conn = sqlite3.connect('fly_database.db')
-    cursor = conn.cursor()
-    cursor.execute(
-        'CREATE TABLE Flight_schedule(ID INTEGER PRIMARY '
-        'KEY AUTOINCREMENT, Dep_airport, Arr_airport, flight_schedule)'
-    )
+    route = search_params['dep_city'], search_params['arr_city']
+    route_dates = SCHEDULE_INDEX.get(route)
+    if route_dates is not None and dep_date in route_dates.dates:
+        return generate_schedule(route, route_dates)
+
 
+def generate_schedule(route, route_dates):
+    """Convert days of week of route to schedule like "+-+----"."""
 
-def insert_table(schedule_data):
-    """Insert data into table."""
+    return {
+        'dep_city': route[0],
+        'arr_city': route[1],
+        'schedule': ''.join(
+            '+' if route_dates.weekdays >> day & 1 else '-'
+            for day in range(7)
+        ),
+        'days': route_dates.days
+    }
 
-    conn = sqlite3.connect('fly_database.db')
-    cursor = conn.cursor()
-    cursor.execute(
-        'INSERT INTO Flight_schedule(Dep_airport, Arr_airport, '
-        'flight_schedule) VALUES (?, ?, ?)', [*schedule_data.values()]
+
+def sync_all(schedule_index, repository):
+    """Store schedules of all routes of the page, return their number."""
+
+    repository.upsert_many(
+        generate_schedule(route, route_dates)
+        for route, route_dates in schedule_index.items()
     )
-    conn.commit()
-    print('Data has been added to the table.', '\n')
 
+    return len(schedule_index)
+
+
+class ScheduleRepository:
+    """Flight schedules in SQLite database.
+
+    Every thread uses one connection of its own for all queries.
+    SQL of queries is constant, so sqlite3 reuses prepared statements
+    from the statement cache of the connection. Schema of an existing
+    database is upgraded in place on opening.
+    """
+
+    def __init__(self, path=DATABASE):
+        self.path = path
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.migrate()
+
+    def migrate(self):
+        """Run migrations the database misses, return its version."""
+
+        conn = self.connect()
+        with conn:
+            # Lock the database, so other processes opening it at the
+            # same time wait instead of running the same migrations.
+            conn.execute('BEGIN IMMEDIATE')
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise sqlite3.DatabaseError(
+                    'Schema version {0} of {1} is newer than {2}.'.format(
+                        version, self.path, SCHEMA_VERSION))
+            for migration in MIGRATIONS[version:]:
+                for statement in migration:
+                    conn.execute(statement)
+            conn.execute('PRAGMA user_version={}'.format(SCHEMA_VERSION))
+
+        return SCHEMA_VERSION
+
+    def connect(self):
+        """Get connection of the current thread."""
+
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self.local.conn = conn
+            self.local.depth = 0
+            with self.lock:
+                self.connections.append(conn)
+
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Run queries in one transaction, nested ones join the outer one."""
+
+        conn = self.connect()
+        outer = self.local.depth == 0
+        self.local.depth += 1
+        try:
+            if outer:
+                with conn:
+                    yield conn
+            else:
+                yield conn
+        finally:
+            self.local.depth -= 1
+
+    def upsert(self, schedule_data):
+        """Insert schedule of route or update the stored one."""
+
+        self.upsert_many([schedule_data])
+
+    def upsert_many(self, schedules):
+        """Insert or update schedules of routes in one transaction.
+
+        Bitmaps of days of years in "days" of schedules replace all
+        stored ones of the route, years missing in "days" are dropped.
+        """
+
+        schedules = list(schedules)
+        with self.transaction() as conn:
+            conn.executemany(UPSERT_SCHEDULE, (
+                [data['dep_city'], data['arr_city'], data['schedule']]
+                for data in schedules
+            ))
+            conn.executemany(DELETE_DAYS, (
+                [data['dep_city'], data['arr_city']]
+                for data in schedules if 'days' in data
+            ))
+            conn.executemany(INSERT_DAYS, (
+                [
+                    data['dep_city'], data['arr_city'], year,
+                    bitmap.to_bytes(YEAR_BYTES, 'little')
+                ]
+                for data in schedules
+                for year, bitmap in data.get('days', {}).items()
+            ))
+
+    def find(self, dep_city, arr_city):
+        """Get schedule of route, None if there is no such route."""
+
+        row = self.connect().execute(
+            SELECT_SCHEDULE, [dep_city, arr_city]).fetchone()
+        if row is None:
+            return None
+
+        return {
+            'dep_city': row[0],
+            'arr_city': row[1],
+            'schedule': row[2],
+            'last_refreshed': row[3]
+        }
 
-def select_data_table(search_params):
-    """Select data from table."""
+    def find_arrivals(self, dep_city, first_date, last_date):
+        """Get arrival cities of flights from dep_city between dates."""
 
-    conn = sqlite3.connect('fly_database.db')
-    cursor = conn.cursor()
-    sql = "SELECT * FROM Flight_schedule WHERE Dep_airport=? AND Arr_airport=?"
+        arr_cities = set()
+        for arr_city, year, days in self.connect().execute(
+                SELECT_DEPARTURE_DAYS,
+                [dep_city, first_date.year, last_date.year]):
+            if int.from_bytes(days, 'little') & day_range_mask(
+                    year, first_date, last_date):
+                arr_cities.add(arr_city)
 
-    try:
-        cursor.execute(
-            sql, [search_params['dep_city'], search_params['arr_city']])
-    except sqlite3.OperationalError:
-        create_table()
-        return None
+        return sorted(arr_cities)
 
-    try:
-        result = cursor.fetchall()[0]
-        result = {
-            'dep_city': result[1], 'arr_city': result[2], 'schedule': result[3]
-        }
-    except IndexError:
-        return None
+    def next_dates(self, dep_city, arr_city, first_date, count):
+        """Get up to count dates of flights of route from first_date on."""
+
+        dates = []
+        for year, days in self.connect().execute(
+                SELECT_ROUTE_DAYS, [dep_city, arr_city, first_date.year]):
+            bitmap = int.from_bytes(days, 'little') & day_range_mask(
+                year, first_date, datetime.date(year, 12, 31))
+            for date in iter_days(year, bitmap):
+                if len(dates) == count:
+                    return dates
+                dates.append(date)
 
-    return result
+        return dates
+
+    def close(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+        self.local = threading.local()
 
 
 def get_schedule_data(search_params):
@@ -179,10 +432,8 @@ def get_schedule_data(search_params):
     if not search_params:
         search_params = manual_input()
 
-    if not os.path.isfile('fly_database.db'):
-        create_table()
-
-    data_from_table = select_data_table(search_params)
+    data_from_table = REPOSITORY.find(
+        search_params['dep_city'], search_params['arr_city'])
     data_from_page = find_info_on_query(search_params)
 
     if data_from_table and data_from_page:
@@ -191,7 +442,9 @@ def get_schedule_data(search_params):
     else:
         print('Data not found in the table.', '\n')
         schedule_data = data_from_page
-        insert_table(schedule_data) if schedule_data else None
+        if schedule_data:
+            REPOSITORY.upsert(schedule_data)
+            print('Data has been added to the table.', '\n')
 
     return schedule_data
 
@@ -206,18 +459,39 @@ def print_result(schedule_data):
         print('Departure city:', schedule_data['dep_city'])
         print('Arrival city:', schedule_data['arr_city'])
         print('Flight schedule:', schedule_data['schedule'])
+        if schedule_data.get('last_refreshed'):
+            print('Last refreshed (UTC):', schedule_data['last_refreshed'])
         print('--------------------------------------------')
 
 
 if __name__ == '__main__':
-    AVAILABLE_ROUTES = evelop_scraper.get_available_routes()
-    DICT_WITH_DATES = find_available_dates()
-    QUERY_PARAMS = input_query_params()
-    while True:
-        SCHEDULE_DATA = get_schedule_data(QUERY_PARAMS)
-        print_result(SCHEDULE_DATA)
-        QUERY_PARAMS = None
-        if input(
-                'For exit enter "exit". For exit press "Enter".'
-        ).upper() == 'EXIT':
-            break
+    ARGS = create_parser().parse_args()
+    #  Routes and their dates come from one download of the home page.
+    CATALOG = evelop_routes.get_catalog(evelop_scraper.EVELOP_URL + '/')
+    AVAILABLE_ROUTES = evelop_routes.build_index(CATALOG['routes'])
+    SCHEDULE_INDEX = index_schedules(CATALOG['dates'])
+    REPOSITORY = ScheduleRepository()
+    if ARGS.sync_all:
+        print('Schedules of routes stored:', sync_all(
+            SCHEDULE_INDEX, REPOSITORY))
+    else:
+        QUERY_PARAMS = input_query_params(ARGS)
+        while True:
+            SCHEDULE_DATA = get_schedule_data(QUERY_PARAMS)
+            print_result(SCHEDULE_DATA)
+            if SCHEDULE_DATA and ARGS.next_dates > 0:
+                print('Next departure dates:', ', '.join(
+                    date.strftime('%d-%m-%Y')
+                    for date in REPOSITORY.next_dates(
+                        SCHEDULE_DATA['dep_city'],
+                        SCHEDULE_DATA['arr_city'],
+                        datetime.date.today(),
+                        ARGS.next_dates
+                    )
+                ) or 'unknown, run with --sync_all')
+            QUERY_PARAMS = None
+            if input(
+                    'For exit enter "exit". For exit press "Enter".'
+            ).upper() == 'EXIT':
+                break
+    REPOSITORY.close()
@@ -0,0 +1,145 @@
+"""Python 3.7. HTTP transport for requests to https://www.evelop.com/.
+
+All sessions share one transport adapter, so keep-alive connections are
+reused between sessions. Requests have connect and read timeouts, and
+failed ones (connection errors, timeouts, 429 and 5xx answers) are sent
+again after exponential backoff with jitter. When the site keeps
+failing, a circuit breaker fails requests at once for a while instead
+of letting every worker wait for timeouts.
+"""
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import evelop_metrics
+
+#  Seconds to connect and to wait for an answer.
+TIMEOUT = (5, 30)
+POOL_SIZE = 16
+RETRIES = 3
+BACKOFF = 0.5
+MAX_BACKOFF = 10
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+#  Failures in a row opening the circuit and seconds it stays open.
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+
+ADAPTER = None
+LOCK = threading.Lock()
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Request is not sent because the site keeps failing."""
+
+
+class CircuitBreaker:
+    """Fail requests at once after "threshold" failures in a row.
+
+    After "reset_timeout" seconds one request is let through; if it
+    succeeds, the circuit is closed, otherwise it stays open.
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def check(self):
+        """Raise CircuitOpenError if request must not be sent."""
+
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(
+                    'Circuit is open after {} failures in a row.'.format(
+                        self.failures))
+            # Let this request through, others wait for its result.
+            self.opened_at = time.monotonic()
+
+    def succeed(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def fail(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+def backoff_delay(attempt, backoff=BACKOFF, max_backoff=MAX_BACKOFF):
+    """Get random delay before retry number "attempt" (full jitter)."""
+
+    return random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+
+
+class EvelopAdapter(HTTPAdapter):
+    """Transport adapter with timeouts, retries and circuit breaker."""
+
+    def __init__(self, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF,
+                 breaker=None, pool_maxsize=POOL_SIZE, **kwargs):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        super().__init__(pool_maxsize=pool_maxsize, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        attempt = 0
+        while True:
+            self.breaker.check()
+            try:
+                response = self.send_once(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.breaker.fail()
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.succeed()
+                    return response
+                self.breaker.fail()
+                if attempt >= self.retries:
+                    return response
+                response.close()
+            delay = backoff_delay(attempt, self.backoff)
+            evelop_metrics.record('transport.backoff', delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def send_once(self, request, **kwargs):
+        """Send request once, without retries."""
+
+        return super().send(request, **kwargs)
+
+
+def get_adapter():
+    """Get transport adapter shared by all sessions."""
+
+    global ADAPTER
+    with LOCK:
+        if ADAPTER is None:
+            ADAPTER = EvelopAdapter()
+        return ADAPTER
+
+
+def create_session(adapter=None):
+    """Create session sending requests by adapter (the shared one)."""
+
+    session = requests.session()
+    adapter = adapter or get_adapter()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
@@ -0,0 +1,214 @@
+"""Python 3.7. Watch of searches on the web site https://www.evelop.com/.
+
+Searches of a CSV or JSONL file (see evelop_batch) are run again every
+--interval seconds. Quotes of every search are kept in a state file and
+only changes are written, one JSON object per line:
+
+    {"search": {...}, "change": "price", "quote": {...},
+     "old_price_cents": 32150}
+
+"change" is "new", "removed" or "price". Flights are not priced again
+while their selection (flight ids of the site, which change with fares
+and availability) is the same as in the previous run and the price is
+younger than --max_price_age seconds.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from collections import namedtuple
+
+import evelop_batch
+import evelop_cache
+import evelop_export
+import evelop_models
+import evelop_scraper
+
+STATE_FILE = 'watch_state.json'
+INTERVAL = 5 * 60
+MAX_PRICE_AGE = 30 * 60
+
+WatchedQuote = namedtuple('WatchedQuote', ('quote', 'selection', 'priced_at'))
+
+
+def load_state(path):
+    """Load quotes of searches by search keys, empty if there is no file."""
+
+    try:
+        with open(path) as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+
+    watched = {}
+    for key, entries in state.items():
+        quotes = evelop_models.load_quotes([entry[0] for entry in entries])
+        watched[key] = [
+            WatchedQuote(quote, tuple(entry[1]), entry[2])
+            for quote, entry in zip(quotes, entries)
+        ]
+
+    return watched
+
+
+def save_state(path, state):
+    """Write state of searches atomically."""
+
+    temp_file = path + '.tmp'
+    with open(temp_file, 'w') as state_file:
+        json.dump(state, state_file)
+    os.replace(temp_file, path)
+
+
+def watch_search(search_params, previous, workers=1,
+                 max_price_age=MAX_PRICE_AGE):
+    """Search again, pricing only flights with changed selection."""
+
+    now = time.time()
+    known = {
+        entry.selection: entry for entry in previous
+        if now - entry.priced_at < max_price_age
+    }
+    session = evelop_scraper.acquire_session()
+    try:
+        data_page = evelop_scraper.get_data_page(search_params, session)
+        unpriced = evelop_scraper.extract_quotes(data_page, search_params)
+        watched, to_price = [], []
+        for quote, params_for_requests in unpriced or []:
+            selection = tuple(
+                evelop_cache.flight_selection(params_for_requests))
+            entry = known.get(selection)
+            if entry is not None and get_legs(entry.quote) == get_legs(quote):
+                watched.append(entry)
+            else:
+                to_price.append((quote, params_for_requests))
+        if to_price:
+            quotes = evelop_scraper.price_quotes(
+                to_price, search_params, session, workers)
+            watched.extend(
+                WatchedQuote(
+                    quote,
+                    tuple(evelop_cache.flight_selection(params_for_requests)),
+                    now
+                )
+                for quote, (_, params_for_requests) in zip(quotes, to_price)
+            )
+    finally:
+        evelop_scraper.release_session(session)
+
+    return watched
+
+
+def get_legs(quote):
+    """Get flights identifying quote between runs."""
+
+    return quote.outbound, quote.inbound
+
+
+def diff_quotes(previous, current):
+    """Yield (change, old quote, new quote) of quotes with same legs."""
+
+    old_quotes = {get_legs(quote): quote for quote in previous}
+    new_quotes = {get_legs(quote): quote for quote in current}
+    for legs, quote in new_quotes.items():
+        old_quote = old_quotes.get(legs)
+        if old_quote is None:
+            yield 'new', None, quote
+        elif (old_quote.price_cents, old_quote.currency) != \
+                (quote.price_cents, quote.currency):
+            yield 'price', old_quote, quote
+    for legs, quote in old_quotes.items():
+        if legs not in new_quotes:
+            yield 'removed', quote, None
+
+
+def change_to_dict(search_params, change, old_quote, new_quote):
+    """Convert change of quote to dict for JSON output."""
+
+    result = {
+        'search': search_params,
+        'change': change,
+        'quote': evelop_models.quote_to_dict(new_quote or old_quote)
+    }
+    if change == 'price':
+        result['old_price_cents'] = old_quote.price_cents
+
+    return result
+
+
+def watch_round(searches, state, output, workers=1,
+                max_price_age=MAX_PRICE_AGE):
+    """Run every search once, write changes and update state."""
+
+    changes = 0
+    for key, search_params in searches.items():
+        previous = state.get(key, [])
+        try:
+            current = watch_search(
+                search_params, previous, workers, max_price_age)
+        except Exception as error:
+            print('Search', key, 'failed:', repr(error), file=sys.stderr)
+            continue
+        for change in diff_quotes(
+                [entry.quote for entry in previous],
+                [entry.quote for entry in current]):
+            output.write(
+                json.dumps(change_to_dict(search_params, *change)) + '\n')
+            changes += 1
+        output.flush()
+        state[key] = current
+
+    return changes
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('specs', help='input CSV or JSONL file with searches')
+    PARSER.add_argument(
+        '-o', '--output', help='input JSONL file for changes (default stdout)')
+    PARSER.add_argument(
+        '--state', default=STATE_FILE,
+        help='input JSON file with quotes of the previous run'
+    )
+    PARSER.add_argument(
+        '-i', '--interval', type=float, default=INTERVAL,
+        help='input number of seconds between runs of searches'
+    )
+    PARSER.add_argument(
+        '--max_price_age', type=float, default=MAX_PRICE_AGE,
+        help='input number of seconds after which prices are got again'
+    )
+    PARSER.add_argument(
+        '--once', action='store_true', help='run searches once and exit')
+    PARSER.add_argument(
+        '-w', '--workers', type=int, default=1,
+        help='input number of sessions used for pricing quotes of a search'
+    )
+    ARGS = PARSER.parse_args()
+
+    evelop_scraper.SESSION_POOL = evelop_scraper.create_session_pool(
+        ARGS.workers)
+    evelop_scraper.AVAILABLE_ROUTES = evelop_scraper.get_available_routes()
+    SEARCHES = evelop_batch.plan_searches(
+        evelop_batch.read_specs(ARGS.specs), set())
+    STATE = load_state(ARGS.state)
+    OUTPUT = evelop_export.open_output(ARGS.output)
+    try:
+        while True:
+            STARTED_AT = time.monotonic()
+            watch_round(
+                SEARCHES, STATE, OUTPUT, ARGS.workers, ARGS.max_price_age)
+            save_state(ARGS.state, STATE)
+            if ARGS.once:
+                break
+            time.sleep(max(
+                0, ARGS.interval - (time.monotonic() - STARTED_AT)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if OUTPUT is not sys.stdout:
+            OUTPUT.close()
+        evelop_scraper.SESSION_POOL.close()
@@ -0,0 +1,43 @@
+"""Python 3.7. Test module evelop_async.py."""
+import asyncio
+import os
+import unittest
+
+import evelop_async
+import evelop_fake_server
+import evelop_replay
+import evelop_scraper
+
+FIXTURE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'small')
+
+
+class TestEvelopClient(unittest.TestCase):
+    def setUp(self):
+        self.server = evelop_fake_server.FakeEvelopServer(FIXTURE_DIR)
+        self.server.__enter__()
+        self.urls = evelop_scraper.EVELOP_URL, evelop_scraper.SECURE_URL
+        evelop_scraper.EVELOP_URL = evelop_scraper.SECURE_URL = self.server.url
+        self.search_params = evelop_replay.load_search_params(FIXTURE_DIR)
+
+    def tearDown(self):
+        evelop_scraper.EVELOP_URL, evelop_scraper.SECURE_URL = self.urls
+        self.server.__exit__(None, None, None)
+
+    async def scrape(self, workers):
+        async with evelop_async.EvelopClient(
+                evelop_url=self.server.url,
+                secure_url=self.server.url) as client:
+            return await client.scrape(self.search_params, workers)
+
+    def test_scrape(self):
+        """Test method EvelopClient.scrape(search_params, workers)."""
+        expected = evelop_scraper.scrape(self.search_params)
+        self.assertEqual(len(expected), 400)
+        self.assertEqual(expected[0].price, '321.50 EUR')
+        self.assertEqual(asyncio.run(self.scrape(1)), expected)
+        self.assertEqual(asyncio.run(self.scrape(4)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
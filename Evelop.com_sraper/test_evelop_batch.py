@@ -0,0 +1,34 @@
+"""Python 3.7. Test module evelop_batch.py."""
+import unittest
+from unittest import mock
+
+import evelop_batch
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_acquire(self):
+        """Test method RateLimiter.acquire()."""
+        clock = [100.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        with mock.patch('time.monotonic', lambda: clock[0]), \
+                mock.patch('time.sleep', sleep):
+            limiter = evelop_batch.RateLimiter(rate=2, burst=2)
+            limiter.acquire()
+            limiter.acquire()
+            self.assertEqual(sleeps, [])
+            limiter.acquire()
+            self.assertEqual(sleeps, [0.5])
+            clock[0] += 10
+            # Tokens are never more than the burst.
+            for _ in range(3):
+                limiter.acquire()
+            self.assertEqual(sleeps, [0.5, 0.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
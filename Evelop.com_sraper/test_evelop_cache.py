@@ -0,0 +1,82 @@
+"""Python 3.7. Test module evelop_cache.py."""
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import evelop_cache
+import evelop_models
+
+SEARCH_PARAMS = {
+    'flight_type': 'one_way', 'dep_city': 'mad', 'arr_city': 'cun',
+    'dep_date': '1.8.2030', 'ret_date': '15/08/2030', 'adults': '2',
+    'children': '0', 'infants': '0'
+}
+
+
+class TestCacheKeys(unittest.TestCase):
+    def test_normalize_date(self):
+        """Test function normalize_date(date)."""
+        self.assertEqual(evelop_cache.normalize_date('1.2.2030'), '01/02/2030')
+        self.assertEqual(
+            evelop_cache.normalize_date(' 01-02-2030 '), '01/02/2030')
+
+    def test_search_key(self):
+        """Test function search_key(search_params, **extra)."""
+        key = evelop_cache.search_key(SEARCH_PARAMS)
+        self.assertEqual(key, evelop_cache.search_key(dict(
+            SEARCH_PARAMS, flight_type='ONE_WAY', dep_city='MAD',
+            dep_date='01/08/2030', ret_date='01/08/2030', adults=2)))
+        self.assertNotEqual(key, evelop_cache.search_key(
+            dict(SEARCH_PARAMS, flight_type='ROUND_TRIP')))
+        self.assertNotEqual(key, evelop_cache.search_key(
+            SEARCH_PARAMS, selection=[1]))
+
+    def test_price_key(self):
+        """Test function price_key(search_params, params, legs)."""
+        flight = evelop_models.Flight(
+            'MAD', 'CUN', '01/08/2030', '10:00', '14:00', '10h 0min',
+            'Turista')
+        key = evelop_cache.price_key(SEARCH_PARAMS, ['1'], [flight])
+        self.assertEqual(key, evelop_cache.price_key(
+            dict(SEARCH_PARAMS, dep_city='MAD'), [{'flightId': '1'}],
+            [flight]))
+        self.assertNotEqual(key, evelop_cache.price_key(
+            SEARCH_PARAMS, ['1'], [flight._replace(dep_time='16:00')]))
+        self.assertNotEqual(key, evelop_cache.price_key(
+            SEARCH_PARAMS, ['1'], [flight._replace(cabin_class='Business')]))
+
+
+class TestCaches(unittest.TestCase):
+    def check_cache(self, cache):
+        """Check expiration, LRU eviction and statistics of cache."""
+        cache.set('a', [1])
+        cache.set('b', [2])
+        self.assertEqual(cache.get('a'), [1])
+        cache.set('c', [3])
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), [3])
+        with mock.patch('time.time', return_value=time.time() + cache.ttl):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(
+            cache.stats(),
+            {'hits': 2, 'misses': 2, 'evictions': 1, 'size': 1})
+
+    def test_memory_cache(self):
+        """Test class MemoryCache(max_size, ttl)."""
+        self.check_cache(evelop_cache.MemoryCache(2, 60))
+
+    def test_sqlite_cache(self):
+        """Test class SQLiteCache(path, max_size, ttl)."""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = evelop_cache.SQLiteCache(
+                os.path.join(directory, 'cache.db'), 2, 60)
+            try:
+                self.check_cache(cache)
+            finally:
+                cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+"""Python 3.7. Test module evelop_prices.py."""
+import unittest
+
+import evelop_prices
+
+
+class TestEvelopPrices(unittest.TestCase):
+    def test_price_to_cents(self):
+        """Test function price_to_cents(price)."""
+        self.assertEqual(evelop_prices.price_to_cents('1.234,56 €'), 123456)
+        self.assertEqual(evelop_prices.price_to_cents('1,234.56 $'), 123456)
+        self.assertEqual(evelop_prices.price_to_cents('245,5 €'), 24550)
+        self.assertEqual(evelop_prices.price_to_cents('12 €'), 1200)
+        self.assertEqual(evelop_prices.price_to_cents('1.234 €'), 123400)
+        self.assertIsNone(evelop_prices.price_to_cents('€'))
+        self.assertIsNone(evelop_prices.price_to_cents(None))
+
+    def test_price_currency(self):
+        """Test function price_currency(price)."""
+        self.assertEqual(evelop_prices.price_currency('1.234,56 €'), 'EUR')
+        self.assertEqual(evelop_prices.price_currency('10 CHF'), 'CHF')
+        self.assertIsNone(evelop_prices.price_currency('10'))
+        self.assertIsNone(evelop_prices.price_currency(None))
+
+    def test_format_price(self):
+        """Test function format_price(cents, currency)."""
+        self.assertEqual(
+            evelop_prices.format_price(123405, 'EUR'), '1234.05 EUR')
+        self.assertIsNone(evelop_prices.format_price(None, 'EUR'))
+
+
+if __name__ == '__main__':
+    unittest.main()
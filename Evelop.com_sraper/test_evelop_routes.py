@@ -0,0 +1,37 @@
+"""Python 3.7. Test module evelop_routes.py."""
+import unittest
+
+import evelop_routes
+
+ROUTES = 'routesWebSale = {"MAD": ["CUN"], "CUN": ["MAD"]};'
+DATES = '[{"origin": "MAD", "destination": "CUN", "dates": ["01-08-2030"]}]'
+
+
+class TestParseHomePage(unittest.TestCase):
+    def test_parse_home_page(self):
+        """Test function parse_home_page(page)."""
+        routes = {'MAD': ['CUN'], 'CUN': ['MAD']}
+        dates = [
+            {'origin': 'MAD', 'destination': 'CUN', 'dates': ['01-08-2030']}]
+        self.assertEqual(
+            evelop_routes.parse_home_page(ROUTES + 'var datesWebSale = '
+                                          + DATES + ';'),
+            (routes, dates))
+        self.assertEqual(
+            evelop_routes.parse_home_page(
+                (ROUTES + ' window.dates=' + DATES).encode()),
+            (routes, dates))
+        self.assertEqual(
+            evelop_routes.parse_home_page(ROUTES + 'init(' + DATES + ');'),
+            (routes, None))
+        self.assertEqual(
+            evelop_routes.parse_home_page(ROUTES + 'var sizes = [1, 2];'),
+            (routes, None))
+        self.assertEqual(
+            evelop_routes.parse_home_page(ROUTES), (routes, None))
+        with self.assertRaises(ValueError):
+            evelop_routes.parse_home_page('<html></html>')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""Python 3.7. Test module evelop_sql.py."""
+import datetime
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import evelop_sql
+
+
+class TestScheduleRepository(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'fly_database.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_migrate(self):
+        """Test method ScheduleRepository.migrate()."""
+        conn = sqlite3.connect(self.path)
+        with conn:
+            for statement in evelop_sql.MIGRATIONS[0]:
+                conn.execute(statement)
+            conn.executemany(
+                'INSERT INTO Flight_schedule(Dep_airport, Arr_airport, '
+                'flight_schedule) VALUES (?, ?, ?)',
+                [['MAD', 'CUN', 'old'], ['MAD', 'PUJ', 'only'],
+                 ['MAD', 'CUN', 'new']]
+            )
+        conn.close()
+
+        repository = evelop_sql.ScheduleRepository(self.path)
+        self.assertEqual(repository.find('MAD', 'CUN')['schedule'], 'new')
+        self.assertEqual(repository.find('MAD', 'PUJ')['schedule'], 'only')
+        conn = repository.connect()
+        self.assertEqual(
+            conn.execute('SELECT COUNT(*) FROM Flight_schedule').fetchone(),
+            (2,))
+        self.assertEqual(
+            conn.execute('PRAGMA user_version').fetchone(),
+            (evelop_sql.SCHEMA_VERSION,))
+        self.assertIn(
+            'Flight_schedule_route',
+            [row[1] for row in conn.execute(
+                'PRAGMA index_list(Flight_schedule)')])
+        with self.assertRaises(sqlite3.IntegrityError), conn:
+            conn.execute(
+                'INSERT INTO Flight_schedule(Dep_airport, Arr_airport, '
+                'flight_schedule) VALUES (?, ?, ?)', ['MAD', 'CUN', 'copy'])
+
+        schema = conn.execute('SELECT sql FROM sqlite_master').fetchall()
+        self.assertEqual(repository.migrate(), evelop_sql.SCHEMA_VERSION)
+        self.assertEqual(
+            conn.execute('SELECT sql FROM sqlite_master').fetchall(), schema)
+        self.assertEqual(repository.find('MAD', 'CUN')['schedule'], 'new')
+        repository.close()
+
+    def test_upsert_many(self):
+        """Test method ScheduleRepository.upsert_many(schedules)."""
+        repository = evelop_sql.ScheduleRepository(self.path)
+        schedule = {
+            'dep_city': 'MAD', 'arr_city': 'CUN', 'schedule': 'x',
+            'days': {2030: 0b101, 2031: 1}
+        }
+        repository.upsert_many([schedule])
+        repository.upsert_many([dict(schedule, days={2030: 0b100})])
+        first_date = datetime.date(2030, 1, 1)
+        self.assertEqual(
+            repository.next_dates('MAD', 'CUN', first_date, 5),
+            [datetime.date(2030, 1, 3)])
+        self.assertEqual(
+            repository.find_arrivals('MAD', first_date, first_date), [])
+        repository.close()
+
+
+class TestDayBitmaps(unittest.TestCase):
+    def test_day_range_mask(self):
+        """Test function day_range_mask(year, first_date, last_date)."""
+        self.assertEqual(evelop_sql.day_range_mask(
+            2030, datetime.date(2030, 1, 2), datetime.date(2030, 1, 4)),
+            0b1110)
+        self.assertEqual(evelop_sql.day_range_mask(
+            2030, datetime.date(2029, 12, 1), datetime.date(2030, 1, 1)), 1)
+        self.assertEqual(evelop_sql.day_range_mask(
+            2028, datetime.date(2028, 1, 1), datetime.date(2029, 1, 1)),
+            (1 << 366) - 1)
+        self.assertEqual(evelop_sql.day_range_mask(
+            2030, datetime.date(2031, 1, 1), datetime.date(2031, 2, 1)), 0)
+
+    def test_iter_days(self):
+        """Test function iter_days(year, bitmap)."""
+        self.assertEqual(
+            list(evelop_sql.iter_days(2030, 0b1001)),
+            [datetime.date(2030, 1, 1), datetime.date(2030, 1, 4)])
+        self.assertEqual(
+            list(evelop_sql.iter_days(2028, 1 << 365)),
+            [datetime.date(2028, 12, 31)])
+        self.assertEqual(list(evelop_sql.iter_days(2030, 0)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""Python 3.7. Test module evelop_transport.py."""
+import unittest
+from unittest import mock
+
+import evelop_transport
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_circuit_breaker(self):
+        """Test class CircuitBreaker(threshold, reset_timeout)."""
+        breaker = evelop_transport.CircuitBreaker(2, 30)
+        with mock.patch('time.monotonic', return_value=100):
+            breaker.fail()
+            breaker.check()
+            breaker.fail()
+            with self.assertRaises(evelop_transport.CircuitOpenError):
+                breaker.check()
+        with mock.patch('time.monotonic', return_value=130):
+            # One request is let through after the timeout...
+            breaker.check()
+            with self.assertRaises(evelop_transport.CircuitOpenError):
+                breaker.check()
+            # ... and its failure keeps the circuit open.
+            breaker.fail()
+            with self.assertRaises(evelop_transport.CircuitOpenError):
+                breaker.check()
+        with mock.patch('time.monotonic', return_value=160):
+            breaker.check()
+            breaker.succeed()
+            breaker.check()
+            breaker.fail()
+            breaker.check()
+
+    def test_backoff_delay(self):
+        """Test function backoff_delay(attempt, backoff, max_backoff)."""
+        for attempt in range(10):
+            self.assertTrue(
+                0 <= evelop_transport.backoff_delay(attempt, 0.5, 4) <= 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
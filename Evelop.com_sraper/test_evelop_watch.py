@@ -0,0 +1,38 @@
+"""Python 3.7. Test module evelop_watch.py."""
+import unittest
+
+import evelop_models
+import evelop_watch
+
+OUTBOUND = evelop_models.Flight(
+    'MAD', 'CUN', '01/08/2030', '10:00', '14:00', '10h 0min', 'Turista')
+INBOUND = evelop_models.Flight(
+    'CUN', 'MAD', '15/08/2030', '18:00', '09:00', '9h 0min', 'Turista')
+LATER = OUTBOUND._replace(dep_time='16:00', arr_time='20:00')
+
+
+class TestDiffQuotes(unittest.TestCase):
+    def test_diff_quotes(self):
+        """Test function diff_quotes(previous, current)."""
+        kept = evelop_models.Quote(OUTBOUND, INBOUND, 50000, 'EUR')
+        repriced = evelop_models.Quote(LATER, INBOUND, 40000, 'EUR')
+        removed = evelop_models.Quote(OUTBOUND, None, 30000, 'EUR')
+        new = evelop_models.Quote(LATER, None, 20000, 'EUR')
+        changes = list(evelop_watch.diff_quotes(
+            [kept, repriced, removed],
+            [kept, repriced._replace(price_cents=35000), new]
+        ))
+        self.assertEqual(changes, [
+            ('price', repriced, repriced._replace(price_cents=35000)),
+            ('new', None, new),
+            ('removed', removed, None)
+        ])
+        self.assertEqual(
+            list(evelop_watch.diff_quotes(
+                [kept], [kept._replace(currency='USD')]))[0][0],
+            'price')
+        self.assertEqual(list(evelop_watch.diff_quotes([kept], [kept])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
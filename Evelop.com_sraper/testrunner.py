@@ -0,0 +1,14 @@
+"""Python 3.7. Launch all tests."""
+import unittest
+
+testmodules = [
+    'test_evelop_async', 'test_evelop_batch', 'test_evelop_cache',
+    'test_evelop_prices', 'test_evelop_routes', 'test_evelop_sql',
+    'test_evelop_transport', 'test_evelop_watch'
+]
+
+if __name__ == '__main__':
+    suite = unittest.TestSuite()
+    for tm in testmodules:
+        suite.addTest(unittest.defaultTestLoader.loadTestsFromName(tm))
+    unittest.TextTestRunner().run(suite)